@@ -28,6 +28,13 @@ JWT_ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("JWT_ACCESS_TOKEN_EXPIRE_MI
 
 DATA_DIR: str = os.getenv("DATA_DIR", "data")
 
+# CORS: разрешенные origin фронтенда (через запятую), по умолчанию "*"
+CORS_ALLOW_ORIGINS: list = [
+    origin.strip()
+    for origin in os.getenv("CORS_ALLOW_ORIGINS", "*").split(",")
+    if origin.strip()
+]
+
 EXPORT_JSON: bool = os.getenv("EXPORT_JSON", "true").lower() == "true"
 
 
@@ -12,11 +12,20 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 # Импортируем и запускаем приложение
 if __name__ == "__main__":
     import uvicorn
-    from app import app
-    
+
+    # Строка "app:app" вместо объекта обязательна для workers > 1:
+    # каждый worker-процесс импортирует приложение заново и открывает
+    # собственное Mongo-соединение в lifespan
     uvicorn.run(
-        app,
+        "app:app",
+        app_dir="src",
         host="0.0.0.0",
         port=8000,
-        log_level="info"
+        workers=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)),
+        # "auto" выбирает uvloop/httptools там, где они доступны, и
+        # откатывается на asyncio/h11 на Windows
+        loop="auto",
+        http="auto",
+        log_level="info",
+        access_log=False
     )
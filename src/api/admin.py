@@ -2,16 +2,19 @@
 Admin endpoints
 """
 
-from fastapi import APIRouter, HTTPException, Depends, status, UploadFile, File
+from fastapi import APIRouter, HTTPException, Depends, Request, status, UploadFile, File
+from fastapi.responses import ORJSONResponse
 from datetime import datetime
 import logging
 from typing import Optional, List
 import tempfile
 import os
 
+from pydantic import ValidationError
+
 from core import (
     AdminDefectCreateRequest, DefectCreateResponse, DefectCreateDetailsResponse,
-    BulkUpdateResponse, Defect, DefectType, SurfaceLocation, SeverityLevel, DefectsRepository
+    BulkUpdateResponse, Defect, SeverityLevel, DefectsRepository
 )
 from core.models import AuditLog, AuditLogAction
 from core.user_repositories import AuditLogRepository
@@ -23,6 +26,9 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(tags=["Admin"])
 
+# Максимум сообщений об ошибках в ответе bulk-обновления
+MAX_BULK_ERRORS = 10
+
 # Глобальные переменные для хранения зависимостей (устанавливаются из app.py)
 _repository_instance: Optional[DefectsRepository] = None
 _ml_classifier_instance = None
@@ -236,7 +242,8 @@ async def upload_files(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/defects/update-all-severities", response_model=BulkUpdateResponse,
+@router.post("/defects/update-all-severities", response_model=None,
+             responses={200: {"model": BulkUpdateResponse}},
              dependencies=[Depends(require_admin)],
              summary="Обновить критичность всех дефектов через ML")
 async def update_all_defect_severities(
@@ -287,8 +294,8 @@ async def update_all_defect_severities(
                     "width_mm": defect.parameters.width_mm,
                     "wall_thickness_mm": defect.parameters.wall_thickness_nominal_mm,
                     "distance_to_weld_m": defect.distance_to_weld_m,
-                    "defect_type": defect.defect_type.value,
-                    "surface_location": defect.surface_location.value,
+                    "defect_type": defect.defect_type,
+                    "surface_location": defect.surface_location,
                     "pipeline_id": defect.pipeline_id,
                     "defect_id": defect.defect_id
                 }
@@ -310,11 +317,13 @@ async def update_all_defect_severities(
                     logger.info(f"Updated defect {defect.defect_id} severity to {predicted_severity}")
                 else:
                     failed += 1
-                    errors.append(f"Failed to update defect {defect.defect_id}")
-                    
+                    if len(errors) < MAX_BULK_ERRORS:
+                        errors.append(f"Failed to update defect {defect.defect_id}")
+
             except Exception as e:
                 failed += 1
-                errors.append(f"Defect {defect.defect_id}: {str(e)}")
+                if len(errors) < MAX_BULK_ERRORS:
+                    errors.append(f"Defect {defect.defect_id}: {str(e)}")
                 logger.error(f"Error updating defect {defect.defect_id}: {str(e)}")
         
         logger.info(f"[ADMIN] User {current_user['username']} updated {updated}/{total_defects} defect severities")
@@ -332,12 +341,14 @@ async def update_all_defect_severities(
             }
         )
         
-        return BulkUpdateResponse(
-            total_defects=total_defects,
-            updated=updated,
-            failed=failed,
-            errors=errors[:10]  # Ограничить количество ошибок
-        )
+        # Ответ собран из доверенных значений — сериализуем напрямую
+        # через orjson без валидационного прохода BulkUpdateResponse
+        return ORJSONResponse({
+            "total_defects": total_defects,
+            "updated": updated,
+            "failed": failed,
+            "errors": errors
+        })
         
     except Exception as e:
         logger.error(f"Error in bulk severity update: {str(e)}")
@@ -347,12 +358,25 @@ async def update_all_defect_severities(
 @router.post("/defects", response_model=DefectCreateResponse,
              dependencies=[Depends(require_admin)],
              summary="Создать новый дефект с ML-предсказанием severity",
-             status_code=status.HTTP_201_CREATED)
+             status_code=status.HTTP_201_CREATED,
+             openapi_extra={"requestBody": {"required": True, "content": {
+                 "application/json": {"schema": AdminDefectCreateRequest.model_json_schema()}
+             }}})
 async def create_defect_with_ml_prediction(
-    request: AdminDefectCreateRequest,
+    http_request: Request,
     current_user: dict = Depends(require_admin)
 ):
     """Создать новый дефект с автоматическим определением критичности через ML"""
+    # Однопроходный разбор тела из байтов (model_validate_json) вместо
+    # пары json.loads + validate в штатном body-парсинге FastAPI
+    try:
+        request = AdminDefectCreateRequest.model_validate_json(await http_request.body())
+    except ValidationError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=e.errors(include_url=False, include_context=False, include_input=False)
+        )
+
     defects_repository = get_defects_repository()
     ml_classifier = get_ml_classifier()
     ml_available = get_ml_available()
@@ -403,22 +427,23 @@ async def create_defect_with_ml_prediction(
         predicted_severity = prediction["severity"]
         probability = prediction["probability"]
         
+        now = datetime.utcnow()
         defect = Defect(
             defect_id=request.defect_id,
             segment_number=request.segment_number,
             measurement_number=0,
             measurement_distance_m=request.measurement_distance_m,
-            defect_type=DefectType(request.details.type),
+            defect_type=request.details.type,
             parameters=request.details.parameters,
             location=request.details.location,
-            surface_location=SurfaceLocation(request.details.surface_location),
+            surface_location=request.details.surface_location,
             distance_to_weld_m=request.details.distance_to_weld_m,
             erf_b31g_code=request.details.erf_b31g_code,
             pipeline_id=request.pipeline_id,
-            severity=SeverityLevel(predicted_severity),
+            severity=SeverityLevel(predicted_severity).value,
             probability=probability,
-            created_at=datetime.utcnow(),
-            updated_at=datetime.utcnow()
+            created_at=now,
+            updated_at=now
         )
         
         result = defects_repository.insert_single_defect(defect)
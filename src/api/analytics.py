@@ -3,21 +3,24 @@ Analytics endpoints
 """
 
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import ORJSONResponse
+import asyncio
 import logging
 
-from core import StatisticsResponse
-
 logger = logging.getLogger(__name__)
 
 router = APIRouter(tags=["Analytics"])
 
 
-@router.get("/statistics", response_model=StatisticsResponse)
+@router.get("/statistics", response_model=None)
 async def get_statistics(defects_repository=None):
     """Получить статистику по дефектам"""
     try:
-        stats = defects_repository.get_statistics()
-        return StatisticsResponse(**stats)
+        # Репозиторий возвращает готовый dict стабильной формы -
+        # отдаем его напрямую без round-trip через StatisticsResponse.
+        # Агрегация в Mongo - блокирующий вызов, уходит в thread pool
+        stats = await asyncio.to_thread(defects_repository.get_statistics)
+        return ORJSONResponse(stats)
     except Exception as e:
         logger.error(f"Error getting statistics: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
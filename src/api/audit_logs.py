@@ -3,7 +3,8 @@ Audit Logs API endpoints
 """
 
 from fastapi import APIRouter, HTTPException, Depends, status
-from typing import List, Optional
+from fastapi.responses import ORJSONResponse
+from typing import Optional
 import logging
 
 from core.models import AuditLog, AuditLogAction
@@ -21,7 +22,7 @@ def get_audit_repository():
     return AuditLogRepository(db_connection)
 
 
-@router.get("", response_model=List[AuditLog],
+@router.get("", response_model=None,
             summary="Получить журнал аудита")
 async def get_audit_logs(
     username: Optional[str] = None,
@@ -40,12 +41,15 @@ async def get_audit_logs(
     if current_user.get("role") != "admin":
         username = current_user["username"]
     
-    return audit_repo.get_logs(
+    logs = audit_repo.get_logs(
         username=username,
         action=action,
         entity=entity,
         limit=limit
     )
+    # Записи уже провалидированы при чтении из БД - отдаем напрямую
+    # через orjson, минуя повторную пробежку jsonable_encoder
+    return ORJSONResponse([log.model_dump(mode="json") for log in logs])
 
 
 @router.post("", response_model=dict,
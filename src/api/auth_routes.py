@@ -2,10 +2,13 @@
 Authentication endpoints
 """
 
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Request, status
 from datetime import timedelta
+import asyncio
 import logging
 
+from pydantic import ValidationError
+
 from core import LoginRequest, TokenResponse, UserInfo
 from auth import authenticate_user, create_access_token, get_current_user
 from config.config import JWT_ACCESS_TOKEN_EXPIRE_MINUTES
@@ -17,18 +20,34 @@ router = APIRouter(prefix="/auth", tags=["Auth"])
 
 @router.post("/login", response_model=TokenResponse,
              summary="Вход в систему",
-             response_description="JWT токен для доступа к защищенным эндпоинтам")
-async def login(credentials: LoginRequest):
+             response_description="JWT токен для доступа к защищенным эндпоинтам",
+             openapi_extra={"requestBody": {"required": True, "content": {
+                 "application/json": {"schema": LoginRequest.model_json_schema()}
+             }}})
+async def login(http_request: Request):
     """
     Аутентификация пользователя и получение JWT токена.
-    
+
     Для разработки:
     - Username: admin
     - Password: admin
-    
+
     Токен нужно передавать в заголовке: Authorization: Bearer <token>
     """
-    user = authenticate_user(credentials.username, credentials.password)
+    # Тело разбирается и валидируется за один проход прямо из байтов
+    # (model_validate_json, jiter в pydantic-core), минуя промежуточный
+    # json.loads в FastAPI; схема тела для /docs задана в openapi_extra
+    try:
+        credentials = LoginRequest.model_validate_json(await http_request.body())
+    except ValidationError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=e.errors(include_url=False, include_context=False, include_input=False)
+        )
+
+    # bcrypt-проверка и поход в Mongo - блокирующие операции, уходят
+    # в thread pool чтобы не останавливать event loop на ~100мс
+    user = await asyncio.to_thread(authenticate_user, credentials.username, credentials.password)
     
     if not user:
         raise HTTPException(
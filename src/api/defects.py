@@ -2,45 +2,111 @@
 Defects CRUD endpoints
 """
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Response
+from fastapi.responses import ORJSONResponse
 from typing import Optional
+import asyncio
 import logging
+import time
 
-from core import DefectType, DefectListResponse, DefectResponse
+import orjson
+
+from core import DefectType
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/defects", tags=["Defects"])
 
+# Допустимые типы дефектов считаются один раз при импорте модуля:
+# O(1)-проверка принадлежности и готовая строка для сообщения об ошибке
+_VALID_DEFECT_TYPES = frozenset(t.value for t in DefectType)
+_VALID_TYPES_STR = ", ".join(t.value for t in DefectType)
 
-def defect_to_response(defect):
-    """Преобразует Defect в DefectResponse"""
-    from core import DefectDetailsResponse, DefectResponse
-    
-    details = DefectDetailsResponse(
-        type=defect.defect_type,
-        parameters=defect.parameters,
-        location=defect.location,
-        surface_location=defect.surface_location,
-        distance_to_weld_m=defect.distance_to_weld_m,
-        erf_b31g_code=defect.erf_b31g_code
-    )
-    
-    severity_value = None
-    if defect.severity:
-        severity_value = defect.severity.value if hasattr(defect.severity, 'value') else str(defect.severity)
-    
-    return DefectResponse(
-        defect_id=defect.defect_id,
-        segment_number=defect.segment_number,
-        measurement_distance_m=defect.measurement_distance_m,
-        pipeline_id=defect.pipeline_id,
-        severity=severity_value,
-        details=details
-    )
 
+def _enum_value(value):
+    """Возвращает .value для Enum или строку/None как есть"""
+    if value is None:
+        return None
+    return value.value if hasattr(value, 'value') else str(value)
 
-@router.get("", response_model=DefectListResponse)
+
+def defect_to_response_dict(defect) -> dict:
+    """Преобразует Defect сразу в plain dict ответа
+
+    Пропускает конструирование DefectResponse + model_dump() на горячем
+    пути списков - orjson сериализует dict напрямую.
+    """
+    params = defect.parameters
+    location = defect.location
+    return {
+        "defect_id": defect.defect_id,
+        "segment_number": defect.segment_number,
+        "measurement_distance_m": defect.measurement_distance_m,
+        "pipeline_id": defect.pipeline_id,
+        "severity": _enum_value(defect.severity),
+        "details": {
+            "type": _enum_value(defect.defect_type),
+            "parameters": {
+                "length_mm": params.length_mm,
+                "width_mm": params.width_mm,
+                "depth_mm": params.depth_mm,
+                "depth_percent": params.depth_percent,
+                "wall_thickness_nominal_mm": params.wall_thickness_nominal_mm
+            },
+            "location": {
+                "latitude": location.latitude,
+                "longitude": location.longitude,
+                "altitude": location.altitude
+            },
+            "surface_location": _enum_value(defect.surface_location),
+            "distance_to_weld_m": defect.distance_to_weld_m,
+            "erf_b31g_code": defect.erf_b31g_code
+        }
+    }
+
+
+def defect_list_response(defects, filters_applied=None) -> ORJSONResponse:
+    """Собирает ответ списка дефектов без повторной валидации через response_model"""
+    return ORJSONResponse({
+        "total": len(defects),
+        "defects": [defect_to_response_dict(d) for d in defects],
+        "filters_applied": filters_applied
+    })
+
+
+# Кэш готовых ответов фильтрованных списков: ключ (endpoint, фильтры) ->
+# (поколение данных, срок годности, байты orjson). Популярные фильтры
+# дашборда не перечитывают БД и не пересериализуются на каждый опрос
+_LIST_CACHE_TTL = 30.0
+_LIST_CACHE_MAX = 256
+_list_cache: dict = {}
+
+
+async def cached_defect_list(defects_repository, cache_key, fetch, filters_applied) -> Response:
+    """Отдает список дефектов из кэша или строит и кэширует ответ
+
+    Запись считается валидной пока не истек TTL и данные не менялись
+    (сравнение по data_generation репозитория).
+    """
+    generation = defects_repository.data_generation
+    now = time.monotonic()
+    entry = _list_cache.get(cache_key)
+    if entry is not None and entry[0] == generation and now < entry[1]:
+        body = entry[2]
+    else:
+        defects = await asyncio.to_thread(fetch)
+        body = orjson.dumps({
+            "total": len(defects),
+            "defects": [defect_to_response_dict(d) for d in defects],
+            "filters_applied": filters_applied
+        })
+        if len(_list_cache) >= _LIST_CACHE_MAX:
+            _list_cache.clear()
+        _list_cache[cache_key] = (generation, now + _LIST_CACHE_TTL, body)
+    return Response(body, media_type="application/json")
+
+
+@router.get("", response_model=None)
 async def get_defects(
     defect_type: Optional[str] = Query(None, description="Тип дефекта"),
     segment: Optional[int] = Query(None, description="Номер сегмента"),
@@ -54,31 +120,23 @@ async def get_defects(
     - segment: номер сегмента трубопровода
     """
     try:
-        if defect_type:
-            defects = defects_repository.get_defects_by_type(defect_type)
-        elif segment:
-            defects = defects_repository.get_defects_by_segment(segment)
-        else:
-            defects = defects_repository.get_all_defects()
-        
-        if defect_type and segment:
-            defects = [d for d in defects if d.segment_number == segment]
-        
-        total = len(defects)
-        response_defects = [defect_to_response(d) for d in defects]
-        
-        return DefectListResponse(
-            total=total,
-            defects=response_defects,
-            filters_applied={"defect_type": defect_type, "segment": segment}
+        # Оба фильтра уходят одним запросом в БД (индексы по
+        # defect_type / segment_number), без пост-фильтрации в Python
+        # Блокирующий PyMongo-вызов уходит в thread pool, event loop
+        # продолжает обслуживать другие запросы
+        return await cached_defect_list(
+            defects_repository,
+            ("find", defect_type, segment),
+            lambda: defects_repository.find(defect_type, segment),
+            {"defect_type": defect_type, "segment": segment}
         )
-    
+
     except Exception as e:
         logger.error(f"Error getting defects: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/search", response_model=DefectListResponse)
+@router.get("/search", response_model=None)
 async def search_defects(
     defect_type: Optional[str] = None,
     segment: Optional[int] = None,
@@ -86,34 +144,28 @@ async def search_defects(
 ):
     """Получить дефекты с применением множественных фильтров"""
     try:
-        all_defects = defects_repository.get_all_defects()
-        filtered_defects = all_defects
-        
-        if defect_type:
-            filtered_defects = [d for d in filtered_defects if d.defect_type.value == defect_type]
-        
-        if segment is not None:
-            filtered_defects = [d for d in filtered_defects if d.segment_number == segment]
-        
-        response_defects = [defect_to_response(d) for d in filtered_defects]
-        return DefectListResponse(
-            total=len(filtered_defects),
-            defects=response_defects,
-            filters_applied={"defect_type": defect_type, "segment": segment}
+        return await cached_defect_list(
+            defects_repository,
+            ("find", defect_type, segment),
+            lambda: defects_repository.find(defect_type, segment),
+            {"defect_type": defect_type, "segment": segment}
         )
     except Exception as e:
         logger.error(f"Error searching defects: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/{defect_id}", response_model=DefectResponse)
+@router.get("/{defect_id}", response_model=None)
 async def get_defect(defect_id: str, defects_repository=None):
     """Получить дефект по ID"""
     try:
-        defects = defects_repository.get_all_defects()
-        for defect in defects:
-            if str(defect.defect_id or "") == defect_id:
-                return defect_to_response(defect)
+        # Точечный поиск по уникальному индексу defect_id вместо
+        # линейного скана всей коллекции. Ответ собирается сразу в
+        # plain dict и уходит через orjson, минуя повторную валидацию
+        # DefectResponse и jsonable_encoder
+        defect = await asyncio.to_thread(defects_repository.get_defect_by_id, defect_id)
+        if defect:
+            return ORJSONResponse(defect_to_response_dict(defect))
         raise HTTPException(status_code=404, detail="Defect not found")
     except HTTPException:
         raise
@@ -122,23 +174,21 @@ async def get_defect(defect_id: str, defects_repository=None):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/type/{defect_type}", response_model=DefectListResponse)
+@router.get("/type/{defect_type}", response_model=None)
 async def get_defects_by_type(defect_type: str, defects_repository=None):
     """Получить дефекты по типу"""
     try:
-        valid_types = [t.value for t in DefectType]
-        if defect_type not in valid_types:
+        if defect_type not in _VALID_DEFECT_TYPES:
             raise HTTPException(
                 status_code=400,
-                detail=f"Invalid defect type. Allowed: {', '.join(valid_types)}"
+                detail=f"Invalid defect type. Allowed: {_VALID_TYPES_STR}"
             )
         
-        defects = defects_repository.get_defects_by_type(defect_type)
-        response_defects = [defect_to_response(d) for d in defects]
-        return DefectListResponse(
-            total=len(defects),
-            defects=response_defects,
-            filters_applied={"defect_type": defect_type}
+        return await cached_defect_list(
+            defects_repository,
+            ("type", defect_type),
+            lambda: defects_repository.get_defects_by_type(defect_type),
+            {"defect_type": defect_type}
         )
     except HTTPException:
         raise
@@ -147,16 +197,15 @@ async def get_defects_by_type(defect_type: str, defects_repository=None):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/segment/{segment_id}", response_model=DefectListResponse)
+@router.get("/segment/{segment_id}", response_model=None)
 async def get_defects_by_segment(segment_id: int, defects_repository=None):
     """Получить дефекты по номеру сегмента"""
     try:
-        defects = defects_repository.get_defects_by_segment(segment_id)
-        response_defects = [defect_to_response(d) for d in defects]
-        return DefectListResponse(
-            total=len(defects),
-            defects=response_defects,
-            filters_applied={"segment": segment_id}
+        return await cached_defect_list(
+            defects_repository,
+            ("segment", segment_id),
+            lambda: defects_repository.get_defects_by_segment(segment_id),
+            {"segment": segment_id}
         )
     except Exception as e:
         logger.error(f"Error getting defects by segment: {str(e)}")
@@ -4,39 +4,70 @@ Export endpoints
 
 from fastapi import APIRouter, HTTPException
 from fastapi.responses import FileResponse
-import tempfile
-import json
+import asyncio
 import logging
+import os
+import threading
+
+import orjson
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/export", tags=["Export"])
 
+# Готовый дамп пересобирается только при изменении данных (сравнение по
+# data_generation репозитория) и отдается через FileResponse - starlette
+# использует sendfile(2), ядро шлет файл без копий в userspace
+_EXPORT_PATH = os.path.join('output', 'defects_export.json')
+_export_generation = None
+_export_lock = threading.Lock()
+
+
+def _ensure_export_file(defects_repository) -> str:
+    """Возвращает путь к актуальному дампу, пересобирая его при необходимости"""
+    global _export_generation
+    generation = defects_repository.data_generation
+
+    with _export_lock:
+        if _export_generation == generation and os.path.exists(_EXPORT_PATH):
+            return _EXPORT_PATH
+
+        from .defects import defect_to_response_dict
+
+        defects = defects_repository.get_all_defects()
+        if not defects:
+            raise HTTPException(status_code=404, detail="No defects found")
+
+        data = orjson.dumps(
+            [defect_to_response_dict(d) for d in defects],
+            option=orjson.OPT_INDENT_2
+        )
+
+        # Атомарная замена: параллельные скачивания не видят недописанный файл
+        os.makedirs(os.path.dirname(_EXPORT_PATH), exist_ok=True)
+        tmp_path = _EXPORT_PATH + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, _EXPORT_PATH)
+
+        _export_generation = generation
+        logger.info(f"Экспортный дамп пересобран: {len(defects)} дефектов")
+        return _EXPORT_PATH
+
 
 @router.get("/json")
 async def export_to_json(defects_repository=None):
     """Экспортировать дефекты в JSON файл для скачивания"""
     try:
-        from .defects import defect_to_response
-        
-        defects = defects_repository.get_all_defects()
-        if not defects:
-            raise HTTPException(status_code=404, detail="No defects found")
-        
-        response_defects = [defect_to_response(d) for d in defects]
-        defects_dict = [defect.model_dump() for defect in response_defects]
-        
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as temp_file:
-            json.dump(defects_dict, temp_file, ensure_ascii=False, indent=2)
-            temp_filename = temp_file.name
-        
+        # Сборка дампа (Mongo + сериализация) - блокирующая, уходит в
+        # thread pool; на повторных запросах это только проверка поколения
+        path = await asyncio.to_thread(_ensure_export_file, defects_repository)
         return FileResponse(
-            path=temp_filename,
-            filename="defects_export.json",
+            path,
             media_type='application/json',
-            background=None
+            filename='defects_export.json'
         )
-        
+
     except HTTPException:
         raise
     except Exception as e:
@@ -3,6 +3,7 @@ Health and info endpoints
 """
 
 from fastapi import APIRouter, HTTPException
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
@@ -22,14 +23,13 @@ async def root():
 
 
 @router.get("/health", tags=["Health"])
-async def health_check(db_connection=None, defects_repository=None):
+async def health_check(db_connection=None, defects_repository=None, data_ready=True):
     """Проверка здоровья API"""
     try:
-        defects = defects_repository.get_all_defects()
         return {
-            "status": "healthy",
+            "status": "healthy" if data_ready else "loading",
             "database": "connected" if db_connection else "disconnected",
-            "defects_count": len(defects)
+            "defects_count": defects_repository.count_defects()
         }
     except Exception as e:
         logger.error(f"Health check failed: {str(e)}")
@@ -40,14 +40,18 @@ async def health_check(db_connection=None, defects_repository=None):
 async def get_info(db_connection=None, defects_repository=None, ml_available=False):
     """Получить информацию о системе и доступных сервисах"""
     try:
-        defects = defects_repository.get_all_defects()
-        stats = defects_repository.get_statistics()
-        
+        # Агрегация и подсчет независимы - выполняются параллельно в
+        # thread pool, латентность равна максимуму из двух, а не сумме
+        stats, total_defects = await asyncio.gather(
+            asyncio.to_thread(defects_repository.get_statistics),
+            asyncio.to_thread(defects_repository.count_defects)
+        )
+
         return {
             "application": "IntegrityOS",
             "version": "1.0.0",
             "database_mode": "local" if db_connection.local_mode else "mongodb",
-            "total_defects": len(defects),
+            "total_defects": total_defects,
             "ml_available": ml_available,
             "statistics": stats,
             "available_endpoints": {
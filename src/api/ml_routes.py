@@ -2,10 +2,11 @@
 Machine Learning endpoints
 """
 
-from fastapi import APIRouter, HTTPException
-from typing import Union, Dict, Optional
-from pydantic import BaseModel, Field
-import json
+from fastapi import APIRouter, HTTPException, Response
+from fastapi.responses import ORJSONResponse
+from typing import Union, Dict, List, Optional
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
@@ -20,13 +21,16 @@ class DefectParameters(BaseModel):
     depth_mm: Optional[float] = Field(None, description="Глубина дефекта (мм)")
     depth_percent: float = Field(..., description="Глубина дефекта в %", ge=0, le=100)
     wall_thickness_mm: Optional[float] = Field(None, description="Толщина стенки (мм)", alias="wall_thickness_nominal_mm")
-    
-    class Config:
-        populate_by_name = True  # Позволяет использовать оба имени поля
+
+    # populate_by_name позволяет использовать оба имени поля,
+    # frozen включает более дешевый путь конструирования pydantic-core
+    model_config = ConfigDict(populate_by_name=True, frozen=True)
 
 
 class DefectLocation(BaseModel):
     """Местоположение дефекта"""
+    model_config = ConfigDict(frozen=True)
+
     latitude: float = Field(..., description="Широта", ge=-90, le=90)
     longitude: float = Field(..., description="Долгота", ge=-180, le=180)
     altitude: float = Field(..., description="Высота (м)")
@@ -34,6 +38,8 @@ class DefectLocation(BaseModel):
 
 class DefectDetails(BaseModel):
     """Детальная информация о дефекте"""
+    model_config = ConfigDict(frozen=True)
+
     type: str = Field(..., description="Тип дефекта")
     parameters: DefectParameters
     location: DefectLocation
@@ -44,6 +50,8 @@ class DefectDetails(BaseModel):
 
 class MLPredictionRequestNested(BaseModel):
     """Запрос для предсказания (вложенная структура)"""
+    model_config = ConfigDict(frozen=True)
+
     defect_id: Optional[str] = None
     segment_number: Optional[int] = None
     measurement_distance_m: float = Field(..., ge=0)
@@ -53,6 +61,8 @@ class MLPredictionRequestNested(BaseModel):
 
 class MLPredictionRequest(BaseModel):
     """Запрос для предсказания (плоская структура)"""
+    model_config = ConfigDict(frozen=True)
+
     defect_id: Optional[str] = None
     segment_number: Optional[int] = None
     depth_percent: float = Field(..., ge=0, le=100)
@@ -73,6 +83,8 @@ class MLPredictionRequest(BaseModel):
 
 class MLPredictionResponse(BaseModel):
     """Ответ с предсказанием критичности"""
+    model_config = ConfigDict(frozen=True)
+
     severity: str
     probability: float
     probabilities: Dict[str, float]
@@ -80,6 +92,13 @@ class MLPredictionResponse(BaseModel):
     prediction_timestamp: str
 
 
+# Компилируем схемы валидаторов при импорте модуля, чтобы первый
+# запрос не платил за ленивую сборку pydantic-core
+for _model in (DefectParameters, DefectLocation, DefectDetails,
+               MLPredictionRequestNested, MLPredictionRequest, MLPredictionResponse):
+    _model.model_rebuild()
+
+
 def convert_nested_to_flat(nested_request: MLPredictionRequestNested) -> dict:
     """Конвертация вложенной структуры в плоскую"""
     return {
@@ -102,6 +121,45 @@ def convert_nested_to_flat(nested_request: MLPredictionRequestNested) -> dict:
     }
 
 
+def convert_flat_to_sample(request: MLPredictionRequest) -> dict:
+    """Собирает sample прямым доступом к атрибутам
+
+    Без устаревшего request.dict(), который делает полное
+    рекурсивное копирование модели на каждый вызов.
+    """
+    return {
+        "defect_id": request.defect_id,
+        "segment_number": request.segment_number,
+        "depth_percent": request.depth_percent,
+        "depth_mm": request.depth_mm,
+        "length_mm": request.length_mm,
+        "width_mm": request.width_mm,
+        "wall_thickness_mm": request.wall_thickness_mm,
+        "distance_to_weld_m": request.distance_to_weld_m,
+        "erf_b31g": request.erf_b31g,
+        "altitude_m": request.altitude_m,
+        "latitude": request.latitude,
+        "longitude": request.longitude,
+        "measurement_distance_m": request.measurement_distance_m,
+        "pipeline_id": request.pipeline_id,
+        "defect_type": request.defect_type,
+        "surface_location": request.surface_location
+    }
+
+
+def parse_prediction_payload(payload: dict) -> Union[MLPredictionRequest, MLPredictionRequestNested]:
+    """Выбирает модель запроса по наличию ключа details
+
+    Валидирует ровно одну модель вместо последовательного перебора
+    вариантов Union, который FastAPI делает для смешанных типов.
+    """
+    model = MLPredictionRequestNested if "details" in payload else MLPredictionRequest
+    try:
+        return model.model_validate(payload)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors())
+
+
 @router.post("/predict", response_model=MLPredictionResponse,
              summary="Предсказание критичности дефекта")
 async def predict_defect_criticality(
@@ -126,11 +184,13 @@ async def predict_defect_criticality(
         if isinstance(request, MLPredictionRequestNested):
             sample = convert_nested_to_flat(request)
         else:
-            sample = request.dict()
+            sample = convert_flat_to_sample(request)
         
         result = ml_classifier.predict(sample)
-        
-        return MLPredictionResponse(**result)
+
+        # Результат собран классификатором и уже имеет нужную форму -
+        # model_construct пропускает повторную валидацию pydantic-core
+        return MLPredictionResponse.model_construct(**result)
         
     except ValueError as e:
         raise HTTPException(status_code=400, detail=f"Ошибка в данных: {str(e)}")
@@ -139,25 +199,85 @@ async def predict_defect_criticality(
         raise HTTPException(status_code=500, detail=f"Ошибка предсказания: {str(e)}")
 
 
+@router.post("/predict/batch",
+             summary="Батч-предсказание критичности дефектов")
+async def predict_defect_criticality_batch(
+    requests: List[MLPredictionRequest],
+    ml_classifier=None,
+    ml_available=False
+):
+    """Предсказать критичность для списка дефектов одним вызовом модели
+
+    Признаки собираются в одну матрицу, модель вызывается один раз -
+    накладные расходы sklearn не умножаются на размер батча.
+    """
+    if not ml_available:
+        raise HTTPException(
+            status_code=503,
+            detail="ML модуль недоступен"
+        )
+
+    if ml_classifier is None or not ml_classifier.is_loaded:
+        raise HTTPException(
+            status_code=503,
+            detail="ML модель не загружена"
+        )
+
+    try:
+        samples = [convert_flat_to_sample(request) for request in requests]
+        # Векторизованное предсказание - блокирующий sklearn-вызов
+        # уходит в thread pool
+        results = await asyncio.to_thread(ml_classifier.predict_batch, samples)
+        return ORJSONResponse(results)
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Ошибка в данных: {str(e)}")
+    except Exception as e:
+        logger.error(f"ML batch prediction error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Ошибка предсказания: {str(e)}")
+
+
+# Кэш файла метрик между запросами: (st_mtime_ns, содержимое)
+# Файл меняется только при переобучении модели
+_metrics_cache: Optional[tuple] = None
+
+
+def _load_metrics_bytes(metrics_path) -> Optional[bytes]:
+    """Читает файл метрик с кэшированием по mtime (блокирующий код)"""
+    global _metrics_cache
+
+    if not metrics_path.exists():
+        return None
+
+    mtime_ns = metrics_path.stat().st_mtime_ns
+    if _metrics_cache is None or _metrics_cache[0] != mtime_ns:
+        _metrics_cache = (mtime_ns, metrics_path.read_bytes())
+
+    return _metrics_cache[1]
+
+
 @router.get("/model/metrics",
             summary="Метрики обученной ML модели")
 async def get_model_metrics(metrics_path=None, ml_available=False):
-    """Получить метрики обученной модели"""
+    """Получить метрики обученной модели
+
+    Файл уже содержит готовый JSON - байты отдаются клиенту как есть,
+    без цикла json.load + повторной сериализации на каждый запрос.
+    Дисковый ввод-вывод уходит в thread pool и не блокирует event loop.
+    """
     if not ml_available:
         raise HTTPException(status_code=503, detail="ML модуль недоступен")
-    
+
     try:
-        if not metrics_path.exists():
+        metrics_bytes = await asyncio.to_thread(_load_metrics_bytes, metrics_path)
+        if metrics_bytes is None:
             raise HTTPException(
                 status_code=404,
                 detail="Метрики не найдены. Запустите: python -m src.ml.train"
             )
-        
-        with open(metrics_path, 'r', encoding='utf-8') as f:
-            metrics = json.load(f)
-        
-        return metrics
-        
+
+        return Response(metrics_bytes, media_type="application/json")
+
     except HTTPException:
         raise
     except Exception as e:
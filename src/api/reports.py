@@ -1,6 +1,7 @@
-from fastapi import APIRouter, HTTPException, Query, Depends
+from fastapi import APIRouter, HTTPException, Query, Depends, Response
 from fastapi.responses import FileResponse
-import tempfile
+import functools
+import io
 import json
 import logging
 from datetime import datetime
@@ -533,29 +534,27 @@ def generate_html_report(report_type: str, defects: list = None, stats: dict = N
     return html_content
 
 
-def generate_pdf_report(report_type: str, defects: list = None, stats: dict = None, filepath: str = None):
-    from reportlab.lib.pagesizes import A4
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.lib.units import inch, cm
-    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
-    from reportlab.lib import colors
-    from reportlab.lib.enums import TA_CENTER, TA_LEFT
+@functools.lru_cache(maxsize=1)
+def _resolve_fonts() -> tuple:
+    """Находит и регистрирует TTF-шрифт с кириллицей (один раз на процесс)
+
+    Returns:
+        tuple: (font_name, font_name_bold)
+    """
     from reportlab.pdfbase import pdfmetrics
     from reportlab.pdfbase.ttfonts import TTFont
-    
-    defects = defects or []
-    
-    font_name = 'Helvetica' 
+
+    font_name = 'Helvetica'
     font_name_bold = 'Helvetica-Bold'
-    
+
     font_paths = [
-        '/System/Library/Fonts/Supplemental/Arial.ttf',  
-        '/System/Library/Fonts/Helvetica.ttc', 
+        '/System/Library/Fonts/Supplemental/Arial.ttf',
+        '/System/Library/Fonts/Helvetica.ttc',
         '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
-        '/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf', 
-        'C:/Windows/Fonts/arial.ttf', 
+        '/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf',
+        'C:/Windows/Fonts/arial.ttf',
     ]
-    
+
     for font_path in font_paths:
         if os.path.exists(font_path):
             try:
@@ -566,7 +565,22 @@ def generate_pdf_report(report_type: str, defects: list = None, stats: dict = No
                 break
             except Exception as e:
                 logger.warning(f"Could not register font {font_path}: {e}")
-    
+
+    return font_name, font_name_bold
+
+
+def generate_pdf_report(report_type: str, defects: list = None, stats: dict = None, filepath: str = None):
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.units import inch, cm
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
+    from reportlab.lib import colors
+    from reportlab.lib.enums import TA_CENTER, TA_LEFT
+
+    defects = defects or []
+
+    font_name, font_name_bold = _resolve_fonts()
+
     doc = SimpleDocTemplate(filepath, pagesize=A4, topMargin=1*cm, bottomMargin=1*cm)
     styles = getSampleStyleSheet()
     
@@ -859,28 +873,33 @@ async def generate_report(
         filename = f"Report_{report_type}_{timestamp}.{format}"
         filepath = os.path.join(REPORTS_DIR, filename)
         
+        # Отчет отдается из памяти, на диск пишется один раз только
+        # для истории (/reports/download) - без повторного чтения файла
+        # через FileResponse
         if format == "html":
             html_content = generate_html_report(report_type, defects)
             with open(filepath, 'w', encoding='utf-8') as f:
                 f.write(html_content)
-            
+
             save_report_metadata(filename, report_type, "HTML")
-            
-            return FileResponse(
-                path=filepath,
-                filename=filename,
+
+            return Response(
+                content=html_content,
                 media_type='text/html',
                 headers={"Content-Disposition": f"attachment; filename={filename}"}
             )
-        
+
         elif format == "pdf":
             try:
-                generate_pdf_report(report_type, defects, filepath=filepath)
+                pdf_buffer = io.BytesIO()
+                generate_pdf_report(report_type, defects, filepath=pdf_buffer)
+                pdf_bytes = pdf_buffer.getvalue()
+                with open(filepath, 'wb') as f:
+                    f.write(pdf_bytes)
                 save_report_metadata(filename, report_type, "PDF")
-                
-                return FileResponse(
-                    path=filepath,
-                    filename=filename,
+
+                return Response(
+                    content=pdf_bytes,
                     media_type='application/pdf',
                     headers={"Content-Disposition": f"attachment; filename={filename}"}
                 )
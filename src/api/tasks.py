@@ -3,6 +3,7 @@ Planning/Tasks API endpoints
 """
 
 from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi.responses import ORJSONResponse
 from typing import List, Optional
 import logging
 
@@ -21,7 +22,7 @@ def get_tasks_repository():
     return TasksRepository(db_connection)
 
 
-@router.get("", response_model=List[Task],
+@router.get("", response_model=None,
             summary="Получить список задач")
 async def get_tasks(
     assigned_to: Optional[str] = None,
@@ -31,7 +32,10 @@ async def get_tasks(
 ):
     """Получить список задач с фильтрацией"""
     username = assigned_to or current_user["username"]
-    return tasks_repo.get_all_tasks(username=username, status=status)
+    tasks = tasks_repo.get_all_tasks(username=username, status=status)
+    # Репозиторий уже вернул валидированные Task, повторная валидация
+    # через response_model не нужна
+    return ORJSONResponse([t.model_dump(mode='json') for t in tasks])
 
 
 @router.get("/{task_id}", response_model=Task,
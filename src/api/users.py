@@ -3,7 +3,9 @@ User Profile and Settings API endpoints
 """
 
 from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi.responses import ORJSONResponse
 from typing import List
+import asyncio
 import logging
 
 from core.models import UserProfile, UserProfileUpdate, UserSettings, UserSettingsUpdate, AdminUser
@@ -108,7 +110,7 @@ async def update_settings(
     return settings_repo.get_settings(current_user["username"])
 
 
-@router.get("/list", response_model=List[dict],
+@router.get("/list", response_model=None,
             summary="Получить список всех пользователей (только для админов)")
 async def list_users(
     current_user: dict = Depends(get_current_user),
@@ -122,12 +124,17 @@ async def list_users(
     require_admin(current_user)
     
     # Получаем всех админов
-    admins = admin_repository.get_all_admins()
-    
-    # Получаем профили для каждого админа
+    admins = await asyncio.to_thread(admin_repository.get_all_admins)
+
+    # Профили независимы друг от друга - запрашиваем параллельно через
+    # thread pool, вместо последовательных round-trip на каждого админа
+    profiles = await asyncio.gather(*[
+        asyncio.to_thread(profile_repo.get_profile, admin.username)
+        for admin in admins
+    ])
+
     users = []
-    for admin in admins:
-        profile = profile_repo.get_profile(admin.username)
+    for admin, profile in zip(admins, profiles):
         users.append({
             "username": admin.username,
             "role": admin.role,
@@ -135,6 +142,7 @@ async def list_users(
             "full_name": profile.full_name if profile else admin.username,
             "is_active": admin.is_active
         })
-    
-    return users
+
+    # Список уже состоит из простых dict - отдаем без валидации response_model
+    return ORJSONResponse(users)
 
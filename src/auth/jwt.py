@@ -4,7 +4,12 @@ Handles user authentication, token generation, and authorization
 Uses MongoDB for admin users storage
 """
 
+import functools
+import hashlib
 import os
+import threading
+import time
+
 import bcrypt
 from datetime import datetime, timedelta
 from typing import Optional
@@ -37,11 +42,17 @@ class TokenData(BaseModel):
     role: Optional[str] = None
 
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify a password against its hash"""
-    password_bytes = plain_password.encode('utf-8')
-    hashed_bytes = hashed_password.encode('utf-8')
-    return bcrypt.checkpw(password_bytes, hashed_bytes)
+def verify_password(plain_password, hashed_password) -> bool:
+    """Verify a password against its hash
+
+    Accepts str or bytes for both arguments so callers that already
+    hold encoded bytes don't pay a second encode round-trip.
+    """
+    if isinstance(plain_password, str):
+        plain_password = plain_password.encode('utf-8')
+    if isinstance(hashed_password, str):
+        hashed_password = hashed_password.encode('utf-8')
+    return bcrypt.checkpw(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
@@ -52,33 +63,58 @@ def get_password_hash(password: str) -> str:
     return hashed.decode('utf-8')
 
 
+# Short-lived cache of successful bcrypt checks. checkpw deliberately
+# burns ~100ms of CPU per call; repeat logins with the same credentials
+# don't need to pay it again. Only successes are cached, so failed
+# attempts always take the full bcrypt time (no timing oracle).
+_AUTH_CACHE_TTL = 60.0
+_AUTH_CACHE_MAX = 1024
+_auth_cache: dict = {}
+_auth_cache_lock = threading.Lock()
+
+
 def authenticate_user(username: str, password: str) -> Optional[dict]:
     """
     Authenticate a user by username and password from MongoDB
-    
+
     Args:
         username: Username
         password: Plain text password
-        
+
     Returns:
         User dict if authenticated, None otherwise
     """
     if admin_repository is None:
         return None
-    
+
     # Get user from database
     user = admin_repository.get_user_by_username(username)
     if user is None:
         return None
-    
+
     # Check if user is active
     if not user.is_active:
         return None
-    
-    # Verify password
-    if not verify_password(password, user.password_hash):
-        return None
-    
+
+    # Verify password (cache key includes the stored hash, so a
+    # password change invalidates old entries immediately).
+    # Password is encoded once and the bytes are reused for the cache
+    # key digest and the bcrypt check
+    password_bytes = password.encode('utf-8')
+    cache_key = (username, hashlib.sha256(password_bytes).digest(), user.password_hash)
+    now = time.monotonic()
+    with _auth_cache_lock:
+        expires = _auth_cache.get(cache_key)
+        cache_hit = expires is not None and now < expires
+
+    if not cache_hit:
+        if not verify_password(password_bytes, user.password_hash):
+            return None
+        with _auth_cache_lock:
+            if len(_auth_cache) >= _AUTH_CACHE_MAX:
+                _auth_cache.clear()
+            _auth_cache[cache_key] = now + _AUTH_CACHE_TTL
+
     return {
         "username": user.username,
         "role": user.role
@@ -109,27 +145,42 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 
+@functools.lru_cache(maxsize=4096)
+def _decode_token_cached(token: str) -> Optional[tuple]:
+    """Decode and verify a JWT once per unique token string
+
+    Bearer tokens repeat across requests, so signature verification is
+    memoized. Expiry is re-checked by the caller on every hit because
+    a token cached while valid must still be rejected once it expires.
+    """
+    try:
+        payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
+    except JWTError:
+        return None
+    return payload.get("sub"), payload.get("role"), payload.get("exp")
+
+
 def decode_access_token(token: str) -> Optional[TokenData]:
     """
     Decode and verify a JWT access token
-    
+
     Args:
         token: JWT token string
-        
+
     Returns:
         TokenData if valid, None otherwise
     """
-    try:
-        payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
-        username: str = payload.get("sub")
-        role: str = payload.get("role")
-        
-        if username is None:
-            return None
-        
-        return TokenData(username=username, role=role)
-    except JWTError:
+    decoded = _decode_token_cached(token)
+    if decoded is None:
+        return None
+
+    username, role, exp = decoded
+    if username is None:
         return None
+    if exp is not None and exp < time.time():
+        return None
+
+    return TokenData(username=username, role=role)
 
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
@@ -3,17 +3,27 @@ MongoDB Database Layer for IntegrityOS
 Слой для работы с базой данных MongoDB
 """
 
+import atexit
+import functools
+from array import array
+from collections import Counter, defaultdict
+from itertools import islice
+from operator import itemgetter
 import os
 import logging
+import time
 from typing import List, Optional, Dict, Any
 from datetime import datetime
-from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure, ServerSelectionTimeoutError
+import orjson
+from pymongo import MongoClient, IndexModel
+from pymongo.errors import ConnectionFailure, ServerSelectionTimeoutError, BulkWriteError, OperationFailure
 from pydantic import BaseModel
-import json
 from dotenv import load_dotenv
 
-from core.models import Defect, Pipeline, PipelineObject, DefectResponse, AdminUser
+import numpy as np
+
+from core.models import Defect, DefectParameters, Location, Pipeline, PipelineObject, DefectResponse, AdminUser
+from core.models import DefectType, SeverityLevel, SurfaceLocation
 
 # Загружаем переменные окружения из .env
 load_dotenv()
@@ -22,6 +32,157 @@ load_dotenv()
 logger = logging.getLogger(__name__)
 
 
+@functools.lru_cache(maxsize=None)
+def _shared_client(mongo_uri: str) -> MongoClient:
+    """Один пул соединений MongoClient на процесс и URI
+
+    Повторные MongoDBConnection (репозитории, служебные скрипты)
+    переиспользуют тот же клиент вместо новых TCP-рукопожатий.
+    Закрывается через atexit, а не per-instance close().
+    """
+    # Пул настраивается явно под многопоточные обработчики:
+    # minPoolSize держит сокеты прогретыми, zstd сжимает трафик
+    # (zlib - запасной вариант, если zstandard не установлен)
+    cpu_count = os.cpu_count() or 1
+    client = MongoClient(
+        mongo_uri,
+        maxPoolSize=cpu_count * 4,
+        minPoolSize=cpu_count,
+        serverSelectionTimeoutMS=2000,
+        compressors="zstd,zlib",
+        retryWrites=True,
+        w=1
+    )
+    atexit.register(client.close)
+    return client
+
+# Кэш валидации документов: ключ (_id, updated_at) -> готовый Defect.
+# Повторные чтения неизменившихся строк пропускают полную pydantic-
+# валидацию; изменение документа меняет updated_at и ключ вместе с ним
+_DEFECT_CACHE_MAX = 10000
+_defect_cache: Dict[tuple, Defect] = {}
+
+
+def _build_defect(doc: Dict[str, Any]) -> Defect:
+    """Собирает Defect из доверенного Mongo-документа без валидации
+
+    Документы в коллекции записаны этим же слоем (_defect_to_doc),
+    поэтому повторная pydantic-валидация на чтении не нужна -
+    model_construct собирает вложенные модели напрямую.
+    """
+    params = doc.get('parameters') or {}
+    loc = doc.get('location') or {}
+    created_at = doc.get('created_at')
+    updated_at = doc.get('updated_at')
+    return Defect.model_construct(
+        defect_id=doc.get('defect_id'),
+        segment_number=doc.get('segment_number'),
+        measurement_number=doc.get('measurement_number'),
+        measurement_distance_m=doc.get('measurement_distance_m'),
+        defect_type=doc.get('defect_type'),
+        parameters=DefectParameters(
+            length_mm=params.get('length_mm'),
+            width_mm=params.get('width_mm'),
+            depth_mm=params.get('depth_mm'),
+            depth_percent=params.get('depth_percent'),
+            wall_thickness_nominal_mm=params.get('wall_thickness_nominal_mm'),
+        ),
+        location=Location(
+            latitude=loc.get('latitude'),
+            longitude=loc.get('longitude'),
+            altitude=loc.get('altitude'),
+        ),
+        surface_location=doc.get('surface_location'),
+        distance_to_weld_m=doc.get('distance_to_weld_m'),
+        erf_b31g_code=doc.get('erf_b31g_code'),
+        pipeline_id=doc.get('pipeline_id'),
+        severity=doc.get('severity'),
+        probability=doc.get('probability'),
+        source_file=doc.get('source_file'),
+        # updated_at пишется update_one как datetime, вставка - как
+        # ISO-строка; приводим оба варианта к datetime
+        created_at=datetime.fromisoformat(created_at) if isinstance(created_at, str) else created_at,
+        updated_at=datetime.fromisoformat(updated_at) if isinstance(updated_at, str) else updated_at,
+    )
+
+
+def _defect_from_doc(doc: Dict[str, Any]) -> Defect:
+    """Строит Defect из Mongo-документа через кэш"""
+    key = (doc.get('_id'), doc.get('updated_at'))
+    defect = _defect_cache.get(key)
+    if defect is None:
+        defect = _build_defect(doc)
+        if len(_defect_cache) >= _DEFECT_CACHE_MAX:
+            _defect_cache.clear()
+        _defect_cache[key] = defect
+    return defect
+
+
+def _defect_to_doc(defect: Defect) -> Dict[str, Any]:
+    """Специализированный сериализатор Defect -> dict для записи в БД
+
+    Схема Defect фиксирована, поэтому документ собирается прямым
+    чтением полей вместо общего model_dump(mode='json') - обход
+    дерева полей pydantic на каждый документ не нужен. Форма
+    результата идентична model_dump(mode='json').
+    """
+    params = defect.parameters
+    loc = defect.location
+    created_at = defect.created_at
+    updated_at = defect.updated_at
+    # Категориальные поля - Literal-строки (plain str после валидации),
+    # извлекать .value больше не нужно
+    return {
+        'defect_id': defect.defect_id,
+        'segment_number': defect.segment_number,
+        'measurement_number': defect.measurement_number,
+        'measurement_distance_m': defect.measurement_distance_m,
+        'defect_type': defect.defect_type,
+        'parameters': {
+            'length_mm': params.length_mm,
+            'width_mm': params.width_mm,
+            'depth_mm': params.depth_mm,
+            'depth_percent': params.depth_percent,
+            'wall_thickness_nominal_mm': params.wall_thickness_nominal_mm,
+        },
+        'location': {
+            'latitude': loc.latitude,
+            'longitude': loc.longitude,
+            'altitude': loc.altitude,
+        },
+        'surface_location': defect.surface_location,
+        'distance_to_weld_m': defect.distance_to_weld_m,
+        'erf_b31g_code': defect.erf_b31g_code,
+        'pipeline_id': defect.pipeline_id,
+        'severity': defect.severity,
+        'probability': defect.probability,
+        'source_file': defect.source_file,
+        'created_at': created_at.isoformat() if created_at is not None else None,
+        'updated_at': updated_at.isoformat() if updated_at is not None else None,
+    }
+
+
+# Таблицы кодирования enum -> int для SoA-статистики локального режима:
+# категории хранятся маленькими целыми, подсчет делает np.bincount
+_TYPE_NAMES = [t.value for t in DefectType]
+_TYPE_CODES = {name: i for i, name in enumerate(_TYPE_NAMES)}
+_SEV_NAMES = [s.value for s in SeverityLevel]
+_SEV_CODES = {name: i for i, name in enumerate(_SEV_NAMES)}
+_LOC_NAMES = [l.value for l in SurfaceLocation]
+_LOC_CODES = {name: i for i, name in enumerate(_LOC_NAMES)}
+# Код критического уровня вычислен один раз: счетчик критических
+# дефектов читается индексом из bincount, без строковых сравнений
+_CRIT_CODE = _SEV_CODES[SeverityLevel.CRITICAL.value]
+
+
+def _enum_code(value, table) -> int:
+    """Код enum-значения (или -1 для None/неизвестного)"""
+    if value is None:
+        return -1
+    key = value.value if hasattr(value, 'value') else str(value)
+    return table.get(key, -1)
+
+
 class MongoDBConnection:
     """Управление подключением к MongoDB"""
     
@@ -43,6 +204,21 @@ class MongoDBConnection:
         self.client = None
         self.db = None
         self.defects_data = []  # Для локального режима
+        self.defects_by_id: Dict[str, 'Defect'] = {}  # O(1)-индекс по defect_id
+        # Вторичные индексы-бакеты: выборка по типу/сегменту за O(совпадений)
+        self.defects_by_type: Dict[str, List['Defect']] = defaultdict(list)
+        self.defects_by_segment: Dict[int, List['Defect']] = defaultdict(list)
+
+        # SoA-колонки для векторной статистики: глубина и коды категорий
+        # пополняются на вставке, np считает агрегаты без Python-цикла.
+        # Типизированные array('f')/array('h') вместо списков PyObject* -
+        # 4/2 байта на значение, а np.asarray берет их через buffer
+        # protocol без копирования
+        self.stats_depth = array('f')
+        self.stats_type = array('h')
+        self.stats_severity = array('h')
+        self.stats_location = array('h')
+        self.stats_row_by_id: Dict[str, int] = {}
         
         if not local_mode:
             self._connect()
@@ -50,7 +226,7 @@ class MongoDBConnection:
     def _connect(self):
         """Подключается к MongoDB"""
         try:
-            self.client = MongoClient(self.mongo_uri, serverSelectionTimeoutMS=5000)
+            self.client = _shared_client(self.mongo_uri)
             # Проверка подключения
             self.client.admin.command('ping')
             self.db = self.client[self.database_name]
@@ -66,97 +242,244 @@ class MongoDBConnection:
             self.local_mode = True
             return False
     
+    # Декларативная схема коллекций: имя -> список индексов. Индексы
+    # каждой коллекции создаются одной командой createIndexes
+    COLLECTION_INDEXES = {
+        # Составной индекс покрывает фильтры по типу и тип+сегмент
+        # (префикс), отдельный - по сегменту без типа
+        'defects': [
+            IndexModel('defect_id', unique=True, sparse=True),
+            IndexModel([('defect_type', 1), ('segment_number', 1)]),
+            IndexModel('segment_number'),
+        ],
+        'admin_users': [
+            IndexModel('username', unique=True),
+        ],
+        'user_profiles': [
+            IndexModel('username', unique=True),
+        ],
+        'user_settings': [
+            IndexModel('username', unique=True),
+        ],
+        # ESR-порядок под get_all_tasks: равенство по исполнителю и
+        # статусу, затем сортировка по дате - индекс отдает документы
+        # сразу в нужном порядке без sort в памяти
+        'tasks': [
+            IndexModel([('assigned_to', 1), ('status', 1), ('date', 1)]),
+            IndexModel([('status', 1), ('date', 1)]),
+            IndexModel('date'),
+        ],
+        # "Кто что делал недавно": составные индексы обслуживают выборки
+        # по пользователю (и по пользователю+действию), по действию и по
+        # сущности сразу в порядке сортировки. TTL на created_at
+        # ограничивает рост append-only журнала (и его индексов)
+        # последними 90 днями и покрывает сортировку без фильтров
+        'audit_logs': [
+            # (user, created_at) нужен отдельно: в составном индексе с
+            # action посередине фильтр только по user не может отдать
+            # сортировку по created_at, а user-only - принудительная
+            # форма запроса для всех не-админов
+            IndexModel([('user', 1), ('created_at', -1)]),
+            IndexModel([('user', 1), ('action', 1), ('created_at', -1)]),
+            IndexModel([('action', 1), ('created_at', -1)]),
+            IndexModel([('entity', 1), ('created_at', -1)]),
+            IndexModel('created_at', expireAfterSeconds=60 * 60 * 24 * 90),
+        ],
+        'favorites': [
+            IndexModel([('username', 1), ('object_id', 1)], unique=True),
+        ],
+    }
+
     def _initialize_collections(self):
-        """Инициализирует коллекции и индексы"""
+        """Инициализирует коллекции и индексы по декларативной схеме
+
+        Один list_collection_names на все коллекции и один createIndexes
+        на коллекцию вместо ~20 отдельных round-trip'ов при старте.
+        """
         try:
-            # Коллекция дефектов
-            if 'defects' not in self.db.list_collection_names():
-                self.db.create_collection('defects')
-                logger.info("Создана коллекция 'defects'")
-            
-            # Создаём индексы для дефектов
-            defects_collection = self.db['defects']
-            defects_collection.create_index('defect_id', unique=True, sparse=True)
-            defects_collection.create_index('pipeline_id')
-            defects_collection.create_index('segment_number')
-            defects_collection.create_index('defect_type')
-            logger.info("Индексы для коллекции 'defects' созданы")
-            
-            # Коллекция админ-пользователей
-            if 'admin_users' not in self.db.list_collection_names():
-                self.db.create_collection('admin_users')
-                logger.info("Создана коллекция 'admin_users'")
-            
-            # Создаём индексы для админов
-            admin_collection = self.db['admin_users']
-            admin_collection.create_index('username', unique=True)
-            logger.info("Индексы для коллекции 'admin_users' созданы")
-            
-            # Коллекция профилей пользователей
-            if 'user_profiles' not in self.db.list_collection_names():
-                self.db.create_collection('user_profiles')
-                logger.info("Создана коллекция 'user_profiles'")
-            
-            user_profiles_collection = self.db['user_profiles']
-            user_profiles_collection.create_index('username', unique=True)
-            
-            # Коллекция настроек пользователей
-            if 'user_settings' not in self.db.list_collection_names():
-                self.db.create_collection('user_settings')
-                logger.info("Создана коллекция 'user_settings'")
-            
-            user_settings_collection = self.db['user_settings']
-            user_settings_collection.create_index('username', unique=True)
-            
-            # Коллекция задач
-            if 'tasks' not in self.db.list_collection_names():
-                self.db.create_collection('tasks')
-                logger.info("Создана коллекция 'tasks'")
-            
-            tasks_collection = self.db['tasks']
-            tasks_collection.create_index('assigned_to')
-            tasks_collection.create_index('status')
-            tasks_collection.create_index('date')
-            
-            # Коллекция журнала аудита
-            if 'audit_logs' not in self.db.list_collection_names():
-                self.db.create_collection('audit_logs')
-                logger.info("Создана коллекция 'audit_logs'")
-            
-            audit_logs_collection = self.db['audit_logs']
-            audit_logs_collection.create_index('user')
-            audit_logs_collection.create_index('action')
-            audit_logs_collection.create_index('created_at')
-            
-            # Коллекция избранного
-            if 'favorites' not in self.db.list_collection_names():
-                self.db.create_collection('favorites')
-                logger.info("Создана коллекция 'favorites'")
-            
-            favorites_collection = self.db['favorites']
-            favorites_collection.create_index([('username', 1), ('object_id', 1)], unique=True)
-            
+            existing = set(self.db.list_collection_names())
         except Exception as e:
             logger.warning(f"Ошибка при инициализации коллекций: {str(e)}")
-    
+            return
+
+        # Каждая коллекция в своем try: конфликт индексов на одной не
+        # должен срывать индексы остальных и миграцию ниже
+        for name, indexes in self.COLLECTION_INDEXES.items():
+            try:
+                if name not in existing:
+                    self.db.create_collection(name)
+                    logger.info(f"Создана коллекция '{name}'")
+                self._create_indexes_with_upgrade(name, indexes)
+            except Exception as e:
+                logger.warning(f"Ошибка при инициализации коллекции '{name}': {str(e)}")
+
+        try:
+            self._migrate_legacy_severity_fields()
+        except Exception as e:
+            logger.warning(f"Ошибка миграции устаревших полей severity: {str(e)}")
+        logger.info("Коллекции и индексы инициализированы")
+
+    def _create_indexes_with_upgrade(self, name: str, indexes: List[IndexModel]):
+        """createIndexes с заменой конфликтующих определений
+
+        Если индекс с тем же ключом уже существует с другими опциями
+        (например, created_at_1 на audit_logs без TTL из развертываний
+        до ввода TTL), Mongo отвечает IndexOptionsConflict. Тогда
+        старые индексы с совпадающими ключами удаляются и создание
+        повторяется.
+        """
+        collection = self.db[name]
+        try:
+            collection.create_indexes(indexes)
+            return
+        except OperationFailure as e:
+            # 85 - IndexOptionsConflict, 86 - IndexKeySpecsConflict
+            if e.code not in (85, 86):
+                raise
+
+        existing = {
+            tuple(info['key']): index_name
+            for index_name, info in collection.index_information().items()
+        }
+        for model in indexes:
+            key = tuple(model.document['key'].items())
+            index_name = existing.get(key)
+            if index_name and index_name != '_id_':
+                collection.drop_index(index_name)
+                logger.info(f"Удален конфликтующий индекс '{index_name}' на '{name}'")
+        collection.create_indexes(indexes)
+
+    def _migrate_legacy_severity_fields(self):
+        """Одноразово удаляет устаревшие поля severity из документов
+
+        Раньше update_defect_severity прикладывал $unset этих полей к
+        каждому обновлению; теперь они зачищаются один раз при старте,
+        а горячий путь обновления остается чистым $set.
+        """
+        result = self.db['defects'].update_many(
+            {'$or': [
+                {'details.severity': {'$exists': True}},
+                {'details.probability': {'$exists': True}},
+                {'ml_prediction_probability': {'$exists': True}},
+            ]},
+            {'$unset': {
+                'details.severity': '',
+                'details.probability': '',
+                'ml_prediction_probability': ''
+            }}
+        )
+        if result.modified_count:
+            logger.info(f"Зачищены устаревшие поля severity в {result.modified_count} документах")
+
+    def index_defect(self, defect: 'Defect'):
+        """Добавляет дефект во вторичные индексы по типу и сегменту"""
+        type_key = defect.defect_type.value if hasattr(defect.defect_type, 'value') else str(defect.defect_type)
+        self.defects_by_type[type_key].append(defect)
+        self.defects_by_segment[defect.segment_number].append(defect)
+
+    def append_stats_row(self, defect: 'Defect'):
+        """Добавляет строку дефекта в SoA-колонки статистики"""
+        if defect.defect_id:
+            self.stats_row_by_id[defect.defect_id] = len(self.stats_depth)
+        depth = defect.parameters.depth_percent
+        self.stats_depth.append(depth if depth is not None else np.nan)
+        self.stats_type.append(_enum_code(defect.defect_type, _TYPE_CODES))
+        self.stats_severity.append(_enum_code(defect.severity, _SEV_CODES))
+        self.stats_location.append(_enum_code(defect.surface_location, _LOC_CODES))
+
+    def clear_stats_rows(self):
+        """Сбрасывает SoA-колонки статистики и вторичные индексы"""
+        self.defects_by_type = defaultdict(list)
+        self.defects_by_segment = defaultdict(list)
+        self.stats_depth = array('f')
+        self.stats_type = array('h')
+        self.stats_severity = array('h')
+        self.stats_location = array('h')
+        self.stats_row_by_id = {}
+
+    def acquire_seed_lock(self) -> bool:
+        """Захватить межпроцессный маркер первичного импорта CSV
+
+        При workers > 1 каждый процесс выполняет собственный lifespan и
+        на пустой БД все одновременно видят has_any() == False. Upsert с
+        $setOnInsert атомарен на стороне Mongo, поэтому маркер достается
+        ровно одному процессу - остальные пропускают засев.
+        """
+        if self.local_mode:
+            # Данные живут в памяти процесса - каждый засевает свои
+            return True
+        try:
+            result = self.db['system'].update_one(
+                {'_id': 'csv_seed_lock'},
+                {'$setOnInsert': {'locked_at': datetime.utcnow()}},
+                upsert=True
+            )
+            return result.upserted_id is not None
+        except Exception as e:
+            logger.warning(f"Не удалось получить маркер засева CSV: {str(e)}")
+            return True
+
+    def release_seed_lock(self):
+        """Снять маркер засева после неудачного импорта
+
+        Без снятия упавший между захватом маркера и вставкой процесс
+        навсегда оставил бы БД пустой: последующие старты видели бы
+        занятый маркер и пропускали импорт.
+        """
+        if self.local_mode:
+            return
+        try:
+            self.db['system'].delete_one({'_id': 'csv_seed_lock'})
+        except Exception as e:
+            logger.warning(f"Не удалось снять маркер засева CSV: {str(e)}")
+
     def close(self):
-        """Закрывает подключение"""
-        if self.client:
-            self.client.close()
-            logger.info("Подключение к MongoDB закрыто")
+        """Отвязывается от общего клиента
+
+        Сам пул соединений общий для процесса и закрывается через
+        atexit - закрытие здесь оборвало бы другие подключения.
+        """
+        self.client = None
+        self.db = None
 
 
 class DefectsRepository:
     """Репозиторий для работы с дефектами"""
-    
+
+    # Время жизни кэша статистики (секунды)
+    STATISTICS_CACHE_TTL = 30.0
+
+    # Размер чанка bulk-вставки: достаточно большой для амортизации
+    # round-trip'ов, достаточно маленький для ограничения памяти на
+    # сервере (лимит Mongo - 100000 документов на батч)
+    INSERT_BATCH_SIZE = 1000
+
     def __init__(self, db_connection: MongoDBConnection):
         """Инициализация репозитория
-        
+
         Args:
             db_connection: Объект подключения к БД
         """
         self.db_connection = db_connection
         self.collection_name = 'defects'
+        self._stats_cache: Optional[Dict[str, Any]] = None
+        self._stats_cache_expires = 0.0
+        self._data_generation = 0
+
+    @property
+    def data_generation(self) -> int:
+        """Монотонный счетчик поколений данных (растет при каждой записи)
+
+        Внешние кэши сравнивают сохраненное поколение с текущим, чтобы
+        не отдавать результаты, посчитанные до изменения данных.
+        """
+        return self._data_generation
+
+    def invalidate_statistics_cache(self):
+        """Сбрасывает кэш статистики (вызывается при изменении данных)"""
+        self._stats_cache = None
+        self._stats_cache_expires = 0.0
+        self._data_generation += 1
     
     def _get_collection(self):
         """Получает коллекцию из БД или локального хранилища"""
@@ -181,25 +504,63 @@ class DefectsRepository:
         
         try:
             if self.db_connection.local_mode:
-                # Локальный режим - добавляем в список
+                # Локальный режим - добавляем в список и индекс по ID
                 for defect in defects:
                     self.db_connection.defects_data.append(defect)
+                    if defect.defect_id:
+                        self.db_connection.defects_by_id[defect.defect_id] = defect
+                    self.db_connection.index_defect(defect)
+                    self.db_connection.append_stats_row(defect)
                 result["inserted"] = len(defects)
                 logger.info(f"Добавлено {len(defects)} дефектов в локальное хранилище")
             else:
-                # MongoDB режим
+                # MongoDB режим: вставка ограниченными чанками,
+                # ordered=False - сервер пишет батч параллельно и не
+                # останавливается на первом дубликате/ошибке, а сбой
+                # одного чанка не отменяет остальные
                 collection = self._get_collection()
-                defect_dicts = [json.loads(d.model_dump_json()) for d in defects]
-                insert_result = collection.insert_many(defect_dicts)
-                result["inserted"] = len(insert_result.inserted_ids)
+
+                # Сериализованный документ мемоизируется на инстансе:
+                # повторная вставка тех же объектов (ретрай после
+                # частичного сбоя) не пересериализует дефект, а
+                # сохраненный в документе _id дедуплицирует ретрай
+                def serialized_docs():
+                    for d in defects:
+                        doc = d.__dict__.get('_serialized_doc')
+                        if doc is None:
+                            doc = _defect_to_doc(d)
+                            d.__dict__['_serialized_doc'] = doc
+                        yield doc
+
+                # Генератор + islice: одновременно в памяти живет не
+                # больше INSERT_BATCH_SIZE готовых документов, а не
+                # сериализованная копия всего батча
+                docs = serialized_docs()
+                while True:
+                    chunk = list(islice(docs, self.INSERT_BATCH_SIZE))
+                    if not chunk:
+                        break
+                    try:
+                        insert_result = collection.insert_many(chunk, ordered=False)
+                        result["inserted"] += len(insert_result.inserted_ids)
+                    except BulkWriteError as e:
+                        write_errors = e.details.get('writeErrors', [])
+                        result["inserted"] += len(chunk) - len(write_errors)
+                        result["failed"] += len(write_errors)
+                        for we in write_errors:
+                            result["errors"].append(we.get('errmsg', str(we)))
+                        logger.warning(f"Ошибки записи в чанке вставки: {len(write_errors)}")
                 logger.info(f"Добавлено {result['inserted']} дефектов в MongoDB")
-        
+
         except Exception as e:
             error_msg = f"Ошибка при вставке дефектов: {str(e)}"
             logger.error(error_msg)
-            result["failed"] = len(defects)
+            result["failed"] = len(defects) - result["inserted"]
             result["errors"].append(error_msg)
-        
+
+        if result["inserted"]:
+            self.invalidate_statistics_cache()
+
         return result
     
     def get_all_defects(self) -> List[Defect]:
@@ -214,11 +575,85 @@ class DefectsRepository:
             else:
                 collection = self._get_collection()
                 defect_dicts = list(collection.find())
-                return [Defect(**d) for d in defect_dicts]
+                return [_defect_from_doc(d) for d in defect_dicts]
         except Exception as e:
             logger.error(f"Ошибка при получении дефектов: {str(e)}")
             return []
     
+    def _get_all_raw(self) -> List[Dict[str, Any]]:
+        """Возвращает сырые документы без pydantic-валидации
+
+        Быстрый путь для потребителей, которым нужны только примитивные
+        поля (статистика, экспорт) - типизированные Defect им не нужны.
+        """
+        if self.db_connection.local_mode:
+            return [_defect_to_doc(d) for d in self.db_connection.defects_data]
+        return list(self._get_collection().find({}, batch_size=1000))
+
+    def count_defects(self) -> int:
+        """Возвращает количество дефектов без загрузки коллекции
+
+        Returns:
+            int: Количество дефектов
+        """
+        try:
+            if self.db_connection.local_mode:
+                return len(self.db_connection.defects_data)
+            else:
+                # Читает счетчик из метаданных коллекции, без скана
+                return self._get_collection().estimated_document_count()
+        except Exception as e:
+            logger.error(f"Ошибка при подсчете дефектов: {str(e)}")
+            return 0
+
+    def has_any(self) -> bool:
+        """Проверяет, есть ли хоть один дефект, без выгрузки коллекции
+
+        Returns:
+            bool: True если коллекция непуста
+        """
+        try:
+            if self.db_connection.local_mode:
+                return bool(self.db_connection.defects_data)
+            else:
+                # limit=1: сервер останавливается на первом же документе
+                return self._get_collection().count_documents({}, limit=1) > 0
+        except Exception as e:
+            logger.error(f"Ошибка при проверке наличия дефектов: {str(e)}")
+            return False
+
+    def find(self, defect_type: Optional[str] = None, segment: Optional[int] = None) -> List[Defect]:
+        """Получает дефекты с фильтрацией на стороне БД
+
+        Args:
+            defect_type: Тип дефекта (опционально)
+            segment: Номер сегмента (опционально)
+
+        Returns:
+            List[Defect]: Отфильтрованный список
+        """
+        try:
+            if self.db_connection.local_mode:
+                defects = self.db_connection.defects_data
+                if defect_type:
+                    defects = [d for d in defects if d.defect_type == defect_type]
+                if segment is not None:
+                    defects = [d for d in defects if d.segment_number == segment]
+                return defects
+            else:
+                # Комбинированный запрос уходит в MongoDB и использует
+                # индексы по defect_type / segment_number
+                query = {}
+                if defect_type:
+                    query["defect_type"] = defect_type
+                if segment is not None:
+                    query["segment_number"] = segment
+                collection = self._get_collection()
+                return [_defect_from_doc(d) for d in collection.find(query)]
+        except Exception as e:
+            logger.error(f"Ошибка при поиске дефектов: {str(e)}")
+            return []
+
     def get_defect_by_id(self, defect_id: str) -> Optional[Defect]:
         """Получает дефект по ID
         
@@ -230,15 +665,13 @@ class DefectsRepository:
         """
         try:
             if self.db_connection.local_mode:
-                for defect in self.db_connection.defects_data:
-                    if defect.defect_id == defect_id:
-                        return defect
-                return None
+                # O(1)-поиск по индексу вместо линейного скана списка
+                return self.db_connection.defects_by_id.get(defect_id)
             else:
                 collection = self._get_collection()
                 defect_dict = collection.find_one({"defect_id": defect_id})
                 if defect_dict:
-                    return Defect(**defect_dict)
+                    return _defect_from_doc(defect_dict)
                 return None
         except Exception as e:
             logger.error(f"Ошибка при получении дефекта по ID: {str(e)}")
@@ -255,10 +688,12 @@ class DefectsRepository:
         """
         try:
             if self.db_connection.local_mode:
-                return any(d.defect_id == defect_id for d in self.db_connection.defects_data)
+                return defect_id in self.db_connection.defects_by_id
             else:
+                # find_one по уникальному индексу останавливается на
+                # первом совпадении; наружу уходит только _id
                 collection = self._get_collection()
-                return collection.count_documents({"defect_id": defect_id}) > 0
+                return collection.find_one({"defect_id": defect_id}, projection={'_id': 1}) is not None
         except Exception as e:
             logger.error(f"Ошибка при проверке существования дефекта: {str(e)}")
             return False
@@ -279,27 +714,43 @@ class DefectsRepository:
         }
         
         try:
-            # Проверка уникальности
-            if self.check_defect_exists(defect.defect_id):
-                result["error"] = f"Defect with ID '{defect.defect_id}' already exists"
-                return result
-            
             if self.db_connection.local_mode:
+                # Проверка уникальности по O(1)-индексу
+                if defect.defect_id in self.db_connection.defects_by_id:
+                    result["error"] = f"Defect with ID '{defect.defect_id}' already exists"
+                    return result
                 self.db_connection.defects_data.append(defect)
+                if defect.defect_id:
+                    self.db_connection.defects_by_id[defect.defect_id] = defect
+                self.db_connection.index_defect(defect)
+                self.db_connection.append_stats_row(defect)
                 result["inserted"] = True
                 logger.info(f"Добавлен дефект {defect.defect_id} в локальное хранилище")
             else:
+                # Один upsert вместо проверки + вставки: $setOnInsert
+                # пишет документ только если его еще нет, без TOCTOU-окна
+                # (тот же прием, что в ensure_default_admin)
                 collection = self._get_collection()
-                defect_dict = json.loads(defect.model_dump_json())
-                collection.insert_one(defect_dict)
+                defect_dict = _defect_to_doc(defect)
+                upsert_result = collection.update_one(
+                    {"defect_id": defect.defect_id},
+                    {"$setOnInsert": defect_dict},
+                    upsert=True
+                )
+                if upsert_result.upserted_id is None:
+                    result["error"] = f"Defect with ID '{defect.defect_id}' already exists"
+                    return result
                 result["inserted"] = True
                 logger.info(f"Добавлен дефект {defect.defect_id} в MongoDB")
-        
+
         except Exception as e:
             error_msg = f"Ошибка при вставке дефекта: {str(e)}"
             logger.error(error_msg)
             result["error"] = error_msg
-        
+
+        if result["inserted"]:
+            self.invalidate_statistics_cache()
+
         return result
     
     def update_defect_severity(self, defect_id: str, severity: str, probability: float) -> bool:
@@ -317,16 +768,23 @@ class DefectsRepository:
             from datetime import datetime
             
             if self.db_connection.local_mode:
-                for defect in self.db_connection.defects_data:
-                    if defect.defect_id == defect_id:
-                        defect.severity = severity
-                        defect.probability = probability
-                        defect.updated_at = datetime.utcnow()
-                        logger.info(f"Обновлен severity дефекта {defect_id}: {severity} ({probability:.2f})")
-                        return True
+                defect = self.db_connection.defects_by_id.get(defect_id)
+                if defect is not None:
+                    defect.severity = severity
+                    defect.probability = probability
+                    defect.updated_at = datetime.utcnow()
+                    row = self.db_connection.stats_row_by_id.get(defect_id)
+                    if row is not None:
+                        self.db_connection.stats_severity[row] = _enum_code(severity, _SEV_CODES)
+                    logger.info(f"Обновлен severity дефекта {defect_id}: {severity} ({probability:.2f})")
+                    self.invalidate_statistics_cache()
+                    return True
                 return False
             else:
                 collection = self._get_collection()
+                # Чистый $set: устаревшие поля зачищаются один раз при
+                # старте (_migrate_legacy_severity_fields), а не холостым
+                # $unset на каждом обновлении
                 result = collection.update_one(
                     {"defect_id": defect_id},
                     {
@@ -334,16 +792,12 @@ class DefectsRepository:
                             "severity": severity,
                             "probability": probability,
                             "updated_at": datetime.utcnow()
-                        },
-                        "$unset": {
-                            "details.severity": "",
-                            "details.probability": "",
-                            "ml_prediction_probability": ""
                         }
                     }
                 )
                 if result.modified_count > 0:
                     logger.info(f"Обновлен severity дефекта {defect_id}: {severity} ({probability:.2f})")
+                    self.invalidate_statistics_cache()
                     return True
                 return False
         except Exception as e:
@@ -361,12 +815,15 @@ class DefectsRepository:
         """
         try:
             if self.db_connection.local_mode:
-                return [d for d in self.db_connection.defects_data 
-                        if d.defect_type.value == defect_type]
+                # O(совпадений): готовый бакет вторичного индекса
+                return list(self.db_connection.defects_by_type.get(defect_type, ()))
             else:
+                # batch_size амортизирует round-trip'ы курсора, hint
+                # прибивает запрос к составному индексу (его префиксу)
                 collection = self._get_collection()
-                defect_dicts = list(collection.find({"defect_type": defect_type}))
-                return [Defect(**d) for d in defect_dicts]
+                cursor = collection.find({"defect_type": defect_type}, batch_size=500)
+                cursor = cursor.hint([('defect_type', 1), ('segment_number', 1)])
+                return [_defect_from_doc(d) for d in cursor]
         except Exception as e:
             logger.error(f"Ошибка при фильтрации по типу: {str(e)}")
             return []
@@ -382,12 +839,12 @@ class DefectsRepository:
         """
         try:
             if self.db_connection.local_mode:
-                return [d for d in self.db_connection.defects_data 
-                        if d.segment_number == segment_number]
+                return list(self.db_connection.defects_by_segment.get(segment_number, ()))
             else:
                 collection = self._get_collection()
-                defect_dicts = list(collection.find({"segment_number": segment_number}))
-                return [Defect(**d) for d in defect_dicts]
+                cursor = collection.find({"segment_number": segment_number}, batch_size=500)
+                cursor = cursor.hint([('segment_number', 1)])
+                return [_defect_from_doc(d) for d in cursor]
         except Exception as e:
             logger.error(f"Ошибка при фильтрации по сегменту: {str(e)}")
             return []
@@ -398,8 +855,110 @@ class DefectsRepository:
         Returns:
             Dict с статистикой
         """
-        defects = self.get_all_defects()
-        
+        # Статистика считается по всей коллекции - кэшируем результат
+        # на STATISTICS_CACHE_TTL, кэш сбрасывается при любой записи
+        if self._stats_cache is not None and time.monotonic() < self._stats_cache_expires:
+            return self._stats_cache
+
+        stats = self._compute_statistics()
+        self._stats_cache = stats
+        self._stats_cache_expires = time.monotonic() + self.STATISTICS_CACHE_TTL
+        return stats
+
+    def _compute_statistics(self) -> Dict[str, Any]:
+        """Вычисляет статистику по дефектам"""
+        if not self.db_connection.local_mode:
+            try:
+                return self._compute_statistics_mongo()
+            except Exception as e:
+                logger.error(f"Ошибка агрегации статистики, переход на полную выборку: {str(e)}")
+            return self._compute_statistics_local()
+        return self._compute_statistics_soa()
+
+    def _compute_statistics_soa(self) -> Dict[str, Any]:
+        """Векторная статистика по SoA-колонкам локального режима
+
+        Вместо обхода объектов с доступом к атрибутам - np.bincount по
+        целочисленным кодам и np.nanmean по непрерывному массиву глубин.
+        """
+        conn = self.db_connection
+        total = len(conn.stats_depth)
+        if total == 0:
+            return {
+                "total_defects": 0,
+                "defects_by_type": {},
+                "defects_by_severity": {},
+                "defects_by_location": {},
+                "average_depth_percent": 0,
+                "critical_defects_count": 0
+            }
+
+        depth = np.asarray(conn.stats_depth, dtype=np.float32)
+        type_codes = np.asarray(conn.stats_type, dtype=np.int16)
+        sev_codes = np.asarray(conn.stats_severity, dtype=np.int16)
+        loc_codes = np.asarray(conn.stats_location, dtype=np.int16)
+
+        def counts_by_name(codes, names):
+            counts = np.bincount(codes[codes >= 0], minlength=len(names))
+            return {name: int(n) for name, n in zip(names, counts) if n}
+
+        # bincount по severity считается один раз: и для разбивки по
+        # именам, и для счетчика критических (прямой индекс _CRIT_CODE)
+        sev_counts = np.bincount(sev_codes[sev_codes >= 0], minlength=len(_SEV_NAMES))
+        defects_by_severity = {name: int(n) for name, n in zip(_SEV_NAMES, sev_counts) if n}
+        known_depth = depth[~np.isnan(depth)]
+        avg_depth = float(known_depth.mean()) if known_depth.size else 0
+
+        return {
+            "total_defects": total,
+            "defects_by_type": counts_by_name(type_codes, _TYPE_NAMES),
+            "defects_by_severity": defects_by_severity,
+            "defects_by_location": counts_by_name(loc_codes, _LOC_NAMES),
+            "average_depth_percent": round(avg_depth, 2),
+            "critical_defects_count": int(sev_counts[_CRIT_CODE])
+        }
+
+    def _compute_statistics_mongo(self) -> Dict[str, Any]:
+        """Считает статистику одним $facet-пайплайном на стороне MongoDB
+
+        Все группировки выполняются за один проход по коллекции и один
+        сетевой round-trip - без выгрузки дефектов в Python.
+        """
+        collection = self._get_collection()
+        pipeline = [{
+            "$facet": {
+                "total": [{"$count": "n"}],
+                "by_type": [{"$group": {"_id": "$defect_type", "n": {"$sum": 1}}}],
+                "by_severity": [
+                    {"$match": {"severity": {"$ne": None}}},
+                    {"$group": {"_id": "$severity", "n": {"$sum": 1}}}
+                ],
+                "by_location": [{"$group": {"_id": "$surface_location", "n": {"$sum": 1}}}],
+                "depth": [{"$group": {"_id": None, "avg": {"$avg": "$parameters.depth_percent"}}}]
+            }
+        }]
+        facets = next(collection.aggregate(pipeline))
+
+        defects_by_severity = {d["_id"]: d["n"] for d in facets["by_severity"]}
+        avg_depth = facets["depth"][0]["avg"] if facets["depth"] else None
+
+        return {
+            "total_defects": facets["total"][0]["n"] if facets["total"] else 0,
+            "defects_by_type": {d["_id"]: d["n"] for d in facets["by_type"]},
+            "defects_by_severity": defects_by_severity,
+            "defects_by_location": {d["_id"]: d["n"] for d in facets["by_location"]},
+            "average_depth_percent": round(avg_depth, 2) if avg_depth is not None else 0,
+            "critical_defects_count": defects_by_severity.get("critical", 0)
+        }
+
+    def _compute_statistics_local(self) -> Dict[str, Any]:
+        """Считает статистику по полной выборке дефектов
+
+        Работает по сырым документам - Counter + itemgetter считают в
+        C-цикле, без валидации каждого документа в Defect.
+        """
+        defects = self._get_all_raw()
+
         if not defects:
             return {
                 "total_defects": 0,
@@ -409,43 +968,21 @@ class DefectsRepository:
                 "average_depth_percent": 0,
                 "critical_defects_count": 0
             }
-        
-        # Подсчитываем статистику
-        defects_by_type = {}
-        defects_by_severity = {}
-        defects_by_location = {}
-        depth_values = []
-        critical_count = 0
-        
-        for defect in defects:
-            # По типу
-            type_key = defect.defect_type.value
-            defects_by_type[type_key] = defects_by_type.get(type_key, 0) + 1
-            
-            # По severity
-            if defect.severity:
-                severity_key = defect.severity.value
-                defects_by_severity[severity_key] = defects_by_severity.get(severity_key, 0) + 1
-                if severity_key == "critical":
-                    critical_count += 1
-            
-            # По локации
-            location_key = defect.surface_location.value
-            defects_by_location[location_key] = defects_by_location.get(location_key, 0) + 1
-            
-            # Глубина
-            depth_values.append(defect.parameters.depth_percent)
-        
-        # Средняя глубина
+
+        defects_by_type = Counter(map(itemgetter('defect_type'), defects))
+        defects_by_severity = Counter(d['severity'] for d in defects if d.get('severity'))
+        defects_by_location = Counter(map(itemgetter('surface_location'), defects))
+
+        depth_values = [d['parameters']['depth_percent'] for d in defects]
         avg_depth = sum(depth_values) / len(depth_values) if depth_values else 0
-        
+
         return {
             "total_defects": len(defects),
-            "defects_by_type": defects_by_type,
-            "defects_by_severity": defects_by_severity,
-            "defects_by_location": defects_by_location,
+            "defects_by_type": dict(defects_by_type),
+            "defects_by_severity": dict(defects_by_severity),
+            "defects_by_location": dict(defects_by_location),
             "average_depth_percent": round(avg_depth, 2),
-            "critical_defects_count": critical_count
+            "critical_defects_count": defects_by_severity.get("critical", 0)
         }
     
     def clear_all(self) -> bool:
@@ -457,11 +994,14 @@ class DefectsRepository:
         try:
             if self.db_connection.local_mode:
                 self.db_connection.defects_data = []
+                self.db_connection.defects_by_id = {}
+                self.db_connection.clear_stats_rows()
                 logger.info("Локальное хранилище очищено")
             else:
                 collection = self._get_collection()
                 collection.delete_many({})
                 logger.info("Коллекция дефектов в MongoDB очищена")
+            self.invalidate_statistics_cache()
             return True
         except Exception as e:
             logger.error(f"Ошибка при очистке: {str(e)}")
@@ -477,13 +1017,25 @@ class DefectsRepository:
             bool: Успешность операции
         """
         try:
-            defects = self.get_all_defects()
-            defects_data = [json.loads(d.model_dump_json()) for d in defects]
-            
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(defects_data, f, ensure_ascii=False, indent=2)
-            
-            logger.info(f"Экспортировано {len(defects)} дефектов в {output_file}")
+            # Стриминг по курсору вместо материализации всей коллекции:
+            # память не растет с размером БД, а Mongo-документы уходят в
+            # orjson напрямую, без промежуточной валидации через Defect
+            count = 0
+            with open(output_file, 'wb') as f:
+                f.write(b'[')
+                if self.db_connection.local_mode:
+                    docs = (_defect_to_doc(d) for d in self.db_connection.defects_data)
+                else:
+                    collection = self._get_collection()
+                    docs = collection.find({}, {'_id': 0}, batch_size=1000)
+                for doc in docs:
+                    if count:
+                        f.write(b',\n')
+                    f.write(orjson.dumps(doc))
+                    count += 1
+                f.write(b']')
+
+            logger.info(f"Экспортировано {count} дефектов в {output_file}")
             return True
         except Exception as e:
             logger.error(f"Ошибка при экспорте в JSON: {str(e)}")
@@ -512,7 +1064,7 @@ class PipelinesRepository:
                 self.data.append(pipeline)
             else:
                 collection = self.db_connection.db[self.collection_name]
-                collection.insert_one(json.loads(pipeline.model_dump_json()))
+                collection.insert_one(pipeline.model_dump(mode='json'))
             return True
         except Exception as e:
             logger.error(f"Ошибка при вставке трубопровода: {str(e)}")
@@ -539,14 +1091,12 @@ class PipelinesRepository:
 class AdminUsersRepository:
     def __init__(self, db_connection: MongoDBConnection):
         self.db_connection = db_connection
-        self.local_admins: List[AdminUser] = []
+        # Dict по username: O(1) lookup на каждый запрос аутентификации
+        self.local_admins: Dict[str, AdminUser] = {}
     
     def get_user_by_username(self, username: str) -> Optional[AdminUser]:
         if self.db_connection.local_mode:
-            for user in self.local_admins:
-                if user.username == username:
-                    return user
-            return None
+            return self.local_admins.get(username)
         else:
             try:
                 user_doc = self.db_connection.db['admin_users'].find_one({"username": username})
@@ -559,9 +1109,9 @@ class AdminUsersRepository:
     
     def create_admin(self, admin_user: AdminUser) -> Dict[str, Any]:
         if self.db_connection.local_mode:
-            if any(u.username == admin_user.username for u in self.local_admins):
+            if admin_user.username in self.local_admins:
                 return {"success": False, "error": "User already exists"}
-            self.local_admins.append(admin_user)
+            self.local_admins[admin_user.username] = admin_user
             logger.info(f"[LOCAL] Created admin: {admin_user.username}")
             return {"success": True, "username": admin_user.username}
         else:
@@ -574,9 +1124,38 @@ class AdminUsersRepository:
                 logger.error(f"Error creating admin: {str(e)}")
                 return {"success": False, "error": str(e)}
     
+    def ensure_default_admin(self, admin_user: AdminUser) -> bool:
+        """Создает админа одним идемпотентным upsert, если его еще нет
+
+        Вместо пары get_user_by_username + create_admin (два round-trip
+        и гонка между ними) - один update_one с $setOnInsert.
+
+        Returns:
+            bool: True если админ был создан этим вызовом
+        """
+        if self.db_connection.local_mode:
+            if admin_user.username in self.local_admins:
+                return False
+            self.local_admins[admin_user.username] = admin_user
+            logger.info(f"[LOCAL] Created admin: {admin_user.username}")
+            return True
+        try:
+            result = self.db_connection.db['admin_users'].update_one(
+                {"username": admin_user.username},
+                {"$setOnInsert": admin_user.model_dump()},
+                upsert=True
+            )
+            if result.upserted_id is not None:
+                logger.info(f"[MONGODB] Created admin: {admin_user.username}")
+                return True
+            return False
+        except Exception as e:
+            logger.error(f"Error ensuring default admin: {str(e)}")
+            return False
+
     def get_all_admins(self) -> List[AdminUser]:
         if self.db_connection.local_mode:
-            return self.local_admins
+            return list(self.local_admins.values())
         else:
             try:
                 users = []
@@ -589,9 +1168,7 @@ class AdminUsersRepository:
     
     def delete_admin(self, username: str) -> bool:
         if self.db_connection.local_mode:
-            original_len = len(self.local_admins)
-            self.local_admins = [u for u in self.local_admins if u.username != username]
-            return len(self.local_admins) < original_len
+            return self.local_admins.pop(username, None) is not None
         else:
             try:
                 result = self.db_connection.db['admin_users'].delete_one({"username": username})
@@ -1,14 +1,24 @@
 # Admin User Model
 from typing import Optional, Dict, Any
-from datetime import datetime
+from datetime import datetime, timezone
 from enum import Enum
 from pydantic import BaseModel, Field
 
+
+def _utcnow() -> datetime:
+    """Наивный UTC-timestamp для default_factory
+
+    datetime.utcnow устарел начиная с 3.12; наивная семантика
+    сохранена, чтобы не смешивать aware/naive даты в хранилище.
+    """
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
 class AdminUser(BaseModel):
     username: str = Field(..., description='Username')
     password_hash: str = Field(..., description='Bcrypt password hash')
     role: str = Field(default='admin', description='User role')
-    created_at: datetime = Field(default_factory=datetime.utcnow, description='Creation date')
+    created_at: datetime = Field(default_factory=_utcnow, description='Creation date')
     is_active: bool = Field(default=True, description='Is user active')
 
 
@@ -22,8 +32,8 @@ class UserProfile(BaseModel):
     organization: Optional[str] = Field(None, description='Организация')
     position: Optional[str] = Field(None, description='Должность')
     department: Optional[str] = Field(None, description='Отдел')
-    created_at: datetime = Field(default_factory=datetime.utcnow)
-    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = Field(default_factory=_utcnow)
+    updated_at: datetime = Field(default_factory=_utcnow)
 
 
 class UserProfileUpdate(BaseModel):
@@ -43,8 +53,8 @@ class UserSettings(BaseModel):
     theme: str = Field(default='light', description='Тема оформления (light/dark)')
     language: str = Field(default='ru', description='Язык интерфейса (ru/kz/en)')
     units: str = Field(default='metric', description='Единицы измерения (metric/imperial)')
-    created_at: datetime = Field(default_factory=datetime.utcnow)
-    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = Field(default_factory=_utcnow)
+    updated_at: datetime = Field(default_factory=_utcnow)
 
 
 class UserSettingsUpdate(BaseModel):
@@ -76,8 +86,8 @@ class Task(BaseModel):
     method: Optional[str] = Field(None, description='Метод диагностики')
     description: Optional[str] = Field(None, description='Описание задачи')
     created_by: str = Field(..., description='Создатель задачи')
-    created_at: datetime = Field(default_factory=datetime.utcnow)
-    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = Field(default_factory=_utcnow)
+    updated_at: datetime = Field(default_factory=_utcnow)
 
 
 class TaskCreate(BaseModel):
@@ -126,7 +136,7 @@ class AuditLog(BaseModel):
     entity_id: Optional[str] = Field(None, description='ID сущности')
     ip_address: Optional[str] = Field(None, description='IP адрес')
     details: Optional[Dict[str, Any]] = Field(None, description='Дополнительные детали')
-    created_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = Field(default_factory=_utcnow)
 
 
 # Favorites Model
@@ -138,7 +148,7 @@ class Favorite(BaseModel):
     object_name: str = Field(..., description='Название объекта')
     pipeline: str = Field(..., description='Магистраль')
     object_type: Optional[str] = Field(None, description='Тип объекта')
-    created_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = Field(default_factory=_utcnow)
 
 
 """
@@ -146,10 +156,11 @@ IntegrityOS Data Models
 Модели данных для трубопроводов, объектов контроля и дефектов
 """
 
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Literal
+from dataclasses import dataclass
 from enum import Enum
 from datetime import datetime
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class DefectType(str, Enum):
@@ -220,100 +231,76 @@ class QualityGrade(str, Enum):
     UNACCEPTABLE = "недопустимо"
 
 
-class Location(BaseModel):
-    """GPS координаты"""
-    latitude: float = Field(..., description="Широта [°]")
-    longitude: float = Field(..., description="Долгота [°]")
-    altitude: Optional[float] = Field(None, description="Высота [м]")
+# Literal-аналоги enum'ов для горячих полей Defect: pydantic-core
+# проверяет Literal прямым членством в hash-set'е строк в Rust, без
+# построения enum-члена на каждое поле каждого документа. Enum-классы
+# выше остаются единственным источником значений и символическими
+# константами для кода (DefectType.CORROSION == "коррозия")
+DefectTypeLiteral = Literal[tuple(t.value for t in DefectType)]
+SurfaceLocationLiteral = Literal[tuple(l.value for l in SurfaceLocation)]
+SeverityLevelLiteral = Literal[tuple(s.value for s in SeverityLevel)]
 
-    class Config:
-        json_schema_extra = {
-            "example": {
-                "latitude": 48.476357,
-                "longitude": 57.660536,
-                "altitude": 264.8
-            }
-        }
 
+# Location и DefectParameters - маленькие объекты-значения, которых при
+# массовом импорте создаются сотни тысяч. slots-датаклассы без __dict__ и
+# __pydantic_fields_set__ занимают в разы меньше памяти, чем BaseModel;
+# pydantic валидирует их нативно как поля вложенных моделей, а прямой
+# конструктор на доверенных путях заменяет model_construct
 
-class DefectParameters(BaseModel):
-    """Параметры дефекта"""
-    length_mm: Optional[float] = Field(None, description="Длина [мм]")
-    width_mm: Optional[float] = Field(None, description="Ширина [мм]")
-    depth_mm: Optional[float] = Field(None, description="Глубина абсолютная [мм]")
-    depth_percent: float = Field(..., description="Глубина относительная [%]")
-    wall_thickness_nominal_mm: Optional[float] = Field(None, description="Толщина стенки номинальная [мм]")
+@dataclass(frozen=True, slots=True)
+class Location:
+    """GPS координаты: широта [°], долгота [°], высота [м]"""
+    latitude: float
+    longitude: float
+    altitude: Optional[float] = None
 
-    class Config:
-        json_schema_extra = {
-            "example": {
-                "length_mm": 16.0,
-                "width_mm": 15.0,
-                "depth_mm": 6.0,
-                "depth_percent": 0.54,
-                "wall_thickness_nominal_mm": 7.9
-            }
-        }
+
+@dataclass(frozen=True, slots=True)
+class DefectParameters:
+    """Параметры дефекта: глубина [%], размеры [мм], толщина стенки [мм]"""
+    depth_percent: float
+    length_mm: Optional[float] = None
+    width_mm: Optional[float] = None
+    depth_mm: Optional[float] = None
+    wall_thickness_nominal_mm: Optional[float] = None
 
 
 class Defect(BaseModel):
     """Модель дефекта/аномалии в трубопроводе"""
-    defect_id: Optional[str] = Field(None, description="MongoDB ObjectId")
-    segment_number: int = Field(..., description="Номер сегмента/участка трубы")
-    measurement_number: int = Field(..., description="Номер замера")
-    measurement_distance_m: float = Field(..., description="Расстояние измерения [м]")
-    
-    # Тип и тип дефекта
-    defect_type: DefectType = Field(..., description="Тип дефекта")
-    
+    defect_id: Optional[str] = None  # MongoDB ObjectId
+    segment_number: int  # Номер сегмента/участка трубы
+    measurement_number: int  # Номер замера
+    measurement_distance_m: float  # Расстояние измерения [м]
+
+    # Тип дефекта
+    defect_type: DefectTypeLiteral
+
     # Параметры
-    parameters: DefectParameters = Field(..., description="Параметры дефекта")
-    
+    parameters: DefectParameters
+
     # Локация
-    location: Location = Field(..., description="GPS координаты")
-    surface_location: SurfaceLocation = Field(..., description="Локация на поверхности трубы")
-    distance_to_weld_m: Optional[float] = Field(None, description="Расстояние до шва [м]")
-    erf_b31g_code: Optional[float] = Field(None, description="ERF B31G коэффициент")
-    
+    location: Location
+    surface_location: SurfaceLocationLiteral
+    distance_to_weld_m: Optional[float] = None  # Расстояние до шва [м]
+    erf_b31g_code: Optional[float] = None  # ERF B31G коэффициент
+
     # Метаданные
-    pipeline_id: Optional[str] = Field(None, description="ID трубопровода")
-    
+    pipeline_id: Optional[str] = None  # ID трубопровода
+
     # Критичность (на верхнем уровне)
-    severity: Optional[SeverityLevel] = Field(None, description="Уровень критичности")
-    probability: Optional[float] = Field(None, description="Вероятность предсказания (0-1)")
-    
+    severity: Optional[SeverityLevelLiteral] = None
+    probability: Optional[float] = None  # Вероятность предсказания (0-1)
+
     # Источник данных
-    source_file: Optional[str] = Field(None, description="Исходный файл")
-    created_at: Optional[datetime] = Field(None, description="Дата создания записи")
-    updated_at: Optional[datetime] = Field(None, description="Дата обновления записи")
-    ml_probability: Optional[float] = Field(None, description="Старое поле (deprecated)", exclude=True)
-
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat()
-        }
-        json_schema_extra = {
-            "example": {
-                "segment_number": 3,
-                "measurement_number": 7,
-                "measurement_distance_m": 5.125,
-                "defect_type": "коррозия",
-                "severity": "medium",
-                "parameters": {
-                    "length_mm": 16.0,
-                    "width_mm": 15.0,
-                    "depth_mm": 6.0,
-                    "depth_percent": 0.54,
-                    "wall_thickness_nominal_mm": 7.9
-                },
-                "location": {
-                    "latitude": 48.477933,
-                    "longitude": 57.663105,
-                    "altitude": 264.9
-                },
-                "surface_location": "ВНШ"
-            }
-        }
+    source_file: Optional[str] = None
+    created_at: Optional[datetime] = None  # Дата создания записи
+    updated_at: Optional[datetime] = None  # Дата обновления записи
+
+    # Примеры схем убраны с горячих моделей: Defect/Location/Parameters
+    # конструируются на каждый документ из БД, а примеры нужны только
+    # для OpenAPI-документации запросных моделей. json_encoders тоже не
+    # нужен: pydantic v2 сериализует datetime в ISO8601 нативно, а
+    # legacy-ветка json_encoders заметно медленнее
 
 
 class Pipeline(BaseModel):
@@ -337,13 +324,8 @@ class Pipeline(BaseModel):
     is_active: bool = Field(default=True, description="Активный ли участок")
     
     # Метаданные
-    created_at: datetime = Field(default_factory=datetime.utcnow)
-    updated_at: datetime = Field(default_factory=datetime.utcnow)
-
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat()
-        }
+    created_at: datetime = Field(default_factory=_utcnow)
+    updated_at: datetime = Field(default_factory=_utcnow)
 
 
 class PipelineObject(BaseModel):
@@ -367,13 +349,8 @@ class PipelineObject(BaseModel):
     critical_defects: int = Field(default=0, description="Количество критических дефектов")
     
     # Метаданные
-    created_at: datetime = Field(default_factory=datetime.utcnow)
-    updated_at: datetime = Field(default_factory=datetime.utcnow)
-
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat()
-        }
+    created_at: datetime = Field(default_factory=_utcnow)
+    updated_at: datetime = Field(default_factory=_utcnow)
 
 
 # Pydantic модели для API responses
@@ -414,8 +391,8 @@ class StatisticsResponse(BaseModel):
     average_depth_percent: float
     critical_defects_count: int
 
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "total_defects": 6,
                 "defects_by_type": {
@@ -435,6 +412,7 @@ class StatisticsResponse(BaseModel):
                 "critical_defects_count": 1
             }
         }
+    )
 
 
 # ============================================================================
@@ -446,13 +424,14 @@ class LoginRequest(BaseModel):
     username: str = Field(..., description="Username", min_length=3, max_length=50)
     password: str = Field(..., description="Password", min_length=4)
     
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "username": "admin",
                 "password": "admin"
             }
         }
+    )
 
 
 class TokenResponse(BaseModel):
@@ -462,8 +441,8 @@ class TokenResponse(BaseModel):
     expires_in: int = Field(..., description="Token expiration time in seconds")
     role: str = Field(..., description="User role (admin/user)")
     
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "access_token": "eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9...",
                 "token_type": "bearer",
@@ -471,6 +450,7 @@ class TokenResponse(BaseModel):
                 "role": "admin"
             }
         }
+    )
 
 
 class UserInfo(BaseModel):
@@ -493,8 +473,8 @@ class AdminDefectCreateRequest(BaseModel):
     # Details structure
     details: "AdminDefectDetailsRequest" = Field(..., description="Defect details")
     
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "defect_id": "DEF-2024-001",
                 "segment_number": 5,
@@ -520,14 +500,15 @@ class AdminDefectCreateRequest(BaseModel):
                 }
             }
         }
+    )
 
 
 class AdminDefectDetailsRequest(BaseModel):
     """Defect details for admin creation (without severity)"""
-    type: str = Field(..., description="Defect type")
+    type: DefectTypeLiteral = Field(..., description="Defect type")
     parameters: DefectParameters = Field(..., description="Physical parameters")
     location: Location = Field(..., description="GPS coordinates")
-    surface_location: str = Field(..., description="Surface location (ВНШ/ВНТ)")
+    surface_location: SurfaceLocationLiteral = Field(..., description="Surface location (ВНШ/ВНТ)")
     distance_to_weld_m: Optional[float] = Field(None, description="Distance to weld [m]")
     erf_b31g_code: float = Field(..., description="ERF B31G coefficient")
 
@@ -540,8 +521,8 @@ class DefectCreateResponse(BaseModel):
     pipeline_id: str = Field(..., description="Pipeline ID")
     details: "DefectCreateDetailsResponse" = Field(..., description="Defect details with predictions")
     
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "defect_id": "DEF-2024-001",
                 "segment_number": 5,
@@ -569,6 +550,7 @@ class DefectCreateResponse(BaseModel):
                 }
             }
         }
+    )
 
 
 class DefectCreateDetailsResponse(BaseModel):
@@ -590,8 +572,8 @@ class BulkUpdateResponse(BaseModel):
     failed: int = Field(..., description="Failed to update")
     errors: List[str] = Field(default_factory=list, description="Error messages")
     
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "total_defects": 100,
                 "updated": 98,
@@ -602,5 +584,13 @@ class BulkUpdateResponse(BaseModel):
                 ]
             }
         }
+    )
+
+
+# Модели с forward-ссылками компилируются один раз при импорте, а не
+# лениво на первом запросе: model_rebuild() разрешает строковые ссылки
+# на details-модели, объявленные ниже по файлу
+AdminDefectCreateRequest.model_rebuild()
+DefectCreateResponse.model_rebuild()
 
 
@@ -4,7 +4,11 @@ User-related repositories for IntegrityOS
 """
 
 import logging
-from typing import List, Optional, Dict, Any
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime
 from pymongo.errors import DuplicateKeyError
 
@@ -19,10 +23,29 @@ logger = logging.getLogger(__name__)
 
 class UserProfileRepository:
     """Репозиторий для работы с профилями пользователей"""
-    
+
+    # Профили читаются на каждый запрос и меняются редко: cache-aside
+    # с TTL убирает find_one с горячего пути. Джиттер в TTL размазывает
+    # одновременное протухание записей
+    CACHE_TTL_SECONDS = 300
+    CACHE_TTL_JITTER_SECONDS = 30
+    MAX_CACHE_SIZE = 1000
+
+    # Кэш общий для процесса (атрибут класса): зависимости создают
+    # репозиторий на каждый запрос, и кэш на экземпляре никогда бы не
+    # давал попаданий
+    _cache: Dict[str, Tuple[float, Optional[UserProfile]]] = {}
+
     def __init__(self, db_connection):
         self.db_connection = db_connection
-    
+
+    def _cache_put(self, username: str, profile: Optional[UserProfile]) -> None:
+        """Сохранить профиль в кэше с TTL и джиттером"""
+        if len(self._cache) >= self.MAX_CACHE_SIZE:
+            self._cache.clear()
+        deadline = time.monotonic() + self.CACHE_TTL_SECONDS + random.uniform(0, self.CACHE_TTL_JITTER_SECONDS)
+        self._cache[username] = (deadline, profile)
+
     def get_profile(self, username: str) -> Optional[UserProfile]:
         """Получить профиль пользователя"""
         if self.db_connection.local_mode:
@@ -37,12 +60,19 @@ class UserProfileRepository:
                 department="Отдел технического контроля"
             )
         
+        cached = self._cache.get(username)
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+
         try:
             doc = self.db_connection.db['user_profiles'].find_one({"username": username})
             if doc:
                 doc['username'] = doc.get('username', username)
-                return UserProfile(**doc)
-            return None
+                profile = UserProfile(**doc)
+            else:
+                profile = None
+            self._cache_put(username, profile)
+            return profile
         except Exception as e:
             logger.error(f"Error getting profile: {str(e)}")
             return None
@@ -53,27 +83,28 @@ class UserProfileRepository:
             return True
         
         try:
-            profile = self.get_profile(username)
-            if profile:
-                # Обновление
-                update_data = profile_data.dict(exclude_unset=True)
-                update_data['updated_at'] = datetime.utcnow()
-                self.db_connection.db['user_profiles'].update_one(
-                    {"username": username},
-                    {"$set": update_data}
-                )
-            else:
-                # Создание
-                new_profile = UserProfile(
-                    username=username,
-                    full_name=profile_data.full_name or f"{username} User",
-                    email=profile_data.email or f"{username}@integrityos.kz",
-                    phone=profile_data.phone,
-                    organization=profile_data.organization,
-                    position=profile_data.position,
-                    department=profile_data.department
-                )
-                self.db_connection.db['user_profiles'].insert_one(new_profile.dict())
+            # Один upsert вместо find_one + update/insert: вдвое меньше
+            # round-trip'ов и нет гонки между чтением и записью.
+            # $setOnInsert задает дефолты только для полей, которых нет
+            # в обновлении (пересечение путей $set/$setOnInsert Mongo
+            # не допускает)
+            now = datetime.utcnow()
+            update_data = profile_data.dict(exclude_unset=True)
+            update_data['updated_at'] = now
+            insert_defaults = {
+                'username': username,
+                'full_name': f"{username} User",
+                'email': f"{username}@integrityos.kz",
+                'created_at': now,
+            }
+            on_insert = {k: v for k, v in insert_defaults.items() if k not in update_data}
+            self.db_connection.db['user_profiles'].update_one(
+                {"username": username},
+                {"$set": update_data, "$setOnInsert": on_insert},
+                upsert=True
+            )
+            # Write-invalidate: следующий get_profile перечитает из БД
+            self._cache.pop(username, None)
             return True
         except Exception as e:
             logger.error(f"Error creating/updating profile: {str(e)}")
@@ -82,22 +113,44 @@ class UserProfileRepository:
 
 class UserSettingsRepository:
     """Репозиторий для работы с настройками пользователей"""
-    
+
+    # Тот же cache-aside с TTL, что и у профилей
+    CACHE_TTL_SECONDS = 300
+    CACHE_TTL_JITTER_SECONDS = 30
+    MAX_CACHE_SIZE = 1000
+
+    # Общий для процесса, как и кэш профилей выше
+    _cache: Dict[str, Tuple[float, UserSettings]] = {}
+
     def __init__(self, db_connection):
         self.db_connection = db_connection
-    
+
+    def _cache_put(self, username: str, settings: UserSettings) -> None:
+        """Сохранить настройки в кэше с TTL и джиттером"""
+        if len(self._cache) >= self.MAX_CACHE_SIZE:
+            self._cache.clear()
+        deadline = time.monotonic() + self.CACHE_TTL_SECONDS + random.uniform(0, self.CACHE_TTL_JITTER_SECONDS)
+        self._cache[username] = (deadline, settings)
+
     def get_settings(self, username: str) -> UserSettings:
         """Получить настройки пользователя"""
         if self.db_connection.local_mode:
             return UserSettings(username=username)
         
+        cached = self._cache.get(username)
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+
         try:
             doc = self.db_connection.db['user_settings'].find_one({"username": username})
             if doc:
-                return UserSettings(**doc)
+                settings = UserSettings(**doc)
+                self._cache_put(username, settings)
+                return settings
             # Создаем дефолтные настройки
             default_settings = UserSettings(username=username)
             self.db_connection.db['user_settings'].insert_one(default_settings.dict())
+            self._cache_put(username, default_settings)
             return default_settings
         except Exception as e:
             logger.error(f"Error getting settings: {str(e)}")
@@ -116,6 +169,8 @@ class UserSettingsRepository:
                 {"$set": update_data},
                 upsert=True
             )
+            # Write-invalidate: следующий get_settings перечитает из БД
+            self._cache.pop(username, None)
             return True
         except Exception as e:
             logger.error(f"Error updating settings: {str(e)}")
@@ -127,16 +182,42 @@ class TasksRepository:
     
     def __init__(self, db_connection):
         self.db_connection = db_connection
-        self.local_tasks = []  # Для локального режима
-    
+        # Локальный режим: первичный словарь по id и вторичные индексы
+        # по исполнителю и статусу вместо линейных сканов списка
+        self.local_tasks_by_id: Dict[str, Task] = {}
+        self.local_tasks_by_assignee = defaultdict(set)
+        self.local_tasks_by_status = defaultdict(set)
+        self.local_task_seq = 0
+
+    def _index_local_task(self, task: Task) -> None:
+        """Добавить задачу во все локальные индексы"""
+        self.local_tasks_by_id[task.task_id] = task
+        self.local_tasks_by_assignee[task.assigned_to].add(task.task_id)
+        self.local_tasks_by_status[task.status].add(task.task_id)
+
+    def _unindex_local_task(self, task: Task) -> None:
+        """Убрать задачу из всех локальных индексов"""
+        self.local_tasks_by_id.pop(task.task_id, None)
+        self.local_tasks_by_assignee[task.assigned_to].discard(task.task_id)
+        self.local_tasks_by_status[task.status].discard(task.task_id)
+
     def get_all_tasks(self, username: Optional[str] = None, status: Optional[TaskStatus] = None) -> List[Task]:
         """Получить все задачи"""
         if self.db_connection.local_mode:
-            tasks = self.local_tasks
-            if username:
-                tasks = [t for t in tasks if t.assigned_to == username]
-            if status:
-                tasks = [t for t in tasks if t.status == status]
+            if username is None and status is None:
+                tasks = list(self.local_tasks_by_id.values())
+            else:
+                if username is not None and status is not None:
+                    ids = self.local_tasks_by_assignee.get(username, set()) \
+                        & self.local_tasks_by_status.get(status, set())
+                elif username is not None:
+                    ids = self.local_tasks_by_assignee.get(username, set())
+                else:
+                    ids = self.local_tasks_by_status.get(status, set())
+                tasks = [self.local_tasks_by_id[i] for i in ids]
+            # Порядок set-пересечения произволен - сортируем по дате,
+            # как Mongo-ветка ниже
+            tasks.sort(key=lambda t: t.date)
             return tasks
         
         try:
@@ -160,10 +241,7 @@ class TasksRepository:
     def get_task(self, task_id: str) -> Optional[Task]:
         """Получить задачу по ID"""
         if self.db_connection.local_mode:
-            for task in self.local_tasks:
-                if task.task_id == task_id:
-                    return task
-            return None
+            return self.local_tasks_by_id.get(task_id)
         
         try:
             from bson import ObjectId
@@ -192,8 +270,9 @@ class TasksRepository:
         )
         
         if self.db_connection.local_mode:
-            task.task_id = f"task_{len(self.local_tasks) + 1}"
-            self.local_tasks.append(task)
+            self.local_task_seq += 1
+            task.task_id = f"task_{self.local_task_seq}"
+            self._index_local_task(task)
             return task
         
         try:
@@ -210,14 +289,17 @@ class TasksRepository:
     def update_task(self, task_id: str, task_data: TaskUpdate) -> bool:
         """Обновить задачу"""
         if self.db_connection.local_mode:
-            for task in self.local_tasks:
-                if task.task_id == task_id:
-                    update_data = task_data.dict(exclude_unset=True)
-                    for key, value in update_data.items():
-                        setattr(task, key, value)
-                    task.updated_at = datetime.utcnow()
-                    return True
-            return False
+            task = self.local_tasks_by_id.get(task_id)
+            if task is None:
+                return False
+            # Переиндексация: assigned_to/status могли измениться
+            self._unindex_local_task(task)
+            update_data = task_data.dict(exclude_unset=True)
+            for key, value in update_data.items():
+                setattr(task, key, value)
+            task.updated_at = datetime.utcnow()
+            self._index_local_task(task)
+            return True
         
         try:
             from bson import ObjectId
@@ -235,9 +317,11 @@ class TasksRepository:
     def delete_task(self, task_id: str) -> bool:
         """Удалить задачу"""
         if self.db_connection.local_mode:
-            original_len = len(self.local_tasks)
-            self.local_tasks = [t for t in self.local_tasks if t.task_id != task_id]
-            return len(self.local_tasks) < original_len
+            task = self.local_tasks_by_id.get(task_id)
+            if task is None:
+                return False
+            self._unindex_local_task(task)
+            return True
         
         try:
             from bson import ObjectId
@@ -250,24 +334,109 @@ class TasksRepository:
 
 class AuditLogRepository:
     """Репозиторий для работы с журналом аудита"""
-    
+
+    # Записи аудита терпимы к небольшой задержке, поэтому пишутся не по
+    # одной, а микропакетами: буфер сбрасывается фоновым потоком каждые
+    # ~100 мс или при накоплении FLUSH_BATCH_SIZE записей
+    FLUSH_INTERVAL_SECONDS = 0.1
+    FLUSH_BATCH_SIZE = 500
+
+    # Предел локального журнала (на процесс, только local_mode)
+    LOCAL_LOG_CAPACITY = 10000
+
+    @classmethod
+    def _new_local_deque(cls):
+        return deque(maxlen=cls.LOCAL_LOG_CAPACITY)
+
+    # Буфер и поток записи общие для процесса (атрибуты класса):
+    # зависимости создают репозиторий на каждый запрос, и поток на
+    # экземпляр означал бы утечку потока на каждый записывающий запрос
+    _buffer = deque()
+    _buffer_lock = threading.Lock()
+    _wakeup = threading.Event()
+    _stopping = False
+    _writer = None
+    _writer_db = None
+
     def __init__(self, db_connection):
         self.db_connection = db_connection
-        self.local_logs = []  # Для локального режима
-    
+        # Локальный режим: ограниченный deque плюс вторичные индексы,
+        # чтобы get_logs резал самый узкий подходящий deque, а не
+        # сортировал весь журнал
+        self.local_logs = deque(maxlen=self.LOCAL_LOG_CAPACITY)
+        self.local_logs_by_user = defaultdict(self._new_local_deque)
+        self.local_logs_by_action = defaultdict(self._new_local_deque)
+        self.local_logs_by_entity = defaultdict(self._new_local_deque)
+
+    def _ensure_writer(self):
+        """Лениво запускает общий фоновый поток записи
+
+        Поток создается при первом create_log в процессе и один на все
+        экземпляры; репозитории, используемые только для чтения
+        журнала, потоков не плодят.
+        """
+        cls = AuditLogRepository
+        if cls._writer is None:
+            with cls._buffer_lock:
+                if cls._writer is None:
+                    cls._writer_db = self.db_connection
+                    cls._writer = threading.Thread(
+                        target=cls._writer_loop, name='audit-log-writer', daemon=True
+                    )
+                    cls._writer.start()
+
+    @classmethod
+    def _writer_loop(cls):
+        while not cls._stopping:
+            cls._wakeup.wait(cls.FLUSH_INTERVAL_SECONDS)
+            cls._wakeup.clear()
+            cls.flush()
+
+    @classmethod
+    def flush(cls) -> None:
+        """Сбросить накопленные записи одним insert_many"""
+        with cls._buffer_lock:
+            if not cls._buffer:
+                return
+            docs = list(cls._buffer)
+            cls._buffer.clear()
+            db_connection = cls._writer_db
+        if db_connection is None:
+            return
+        try:
+            # ordered=False: Mongo применяет вставки параллельно, одна
+            # неудачная запись не блокирует остальные
+            db_connection.db['audit_logs'].insert_many(docs, ordered=False)
+        except Exception as e:
+            logger.error(f"Error flushing audit logs: {str(e)}")
+
+    @classmethod
+    def close(cls) -> None:
+        """Остановить фоновую запись и дописать остаток буфера"""
+        cls._stopping = True
+        cls._wakeup.set()
+        if cls._writer is not None:
+            cls._writer.join(timeout=2)
+        cls.flush()
+
     def create_log(self, log: AuditLog) -> bool:
         """Создать запись в журнале"""
         if self.db_connection.local_mode:
             self.local_logs.append(log)
+            self.local_logs_by_user[log.user].append(log)
+            self.local_logs_by_action[log.action].append(log)
+            self.local_logs_by_entity[log.entity].append(log)
             return True
-        
-        try:
-            self.db_connection.db['audit_logs'].insert_one(log.dict())
-            return True
-        except Exception as e:
-            logger.error(f"Error creating audit log: {str(e)}")
-            return False
-    
+
+        cls = AuditLogRepository
+        self._ensure_writer()
+        with cls._buffer_lock:
+            cls._buffer.append(log.dict())
+            if len(cls._buffer) >= cls.FLUSH_BATCH_SIZE:
+                cls._wakeup.set()
+        return True
+
+
     def get_logs(self, 
                  username: Optional[str] = None,
                  action: Optional[AuditLogAction] = None,
@@ -275,14 +444,28 @@ class AuditLogRepository:
                  limit: int = 100) -> List[AuditLog]:
         """Получить записи журнала"""
         if self.db_connection.local_mode:
-            logs = self.local_logs
+            # Журнал append-only, поэтому обход с конца уже дает порядок
+            # created_at DESC без сортировки; из индексов берем самый
+            # узкий и выходим, как только набрали limit
+            candidates = [self.local_logs]
             if username:
-                logs = [l for l in logs if l.user == username]
+                candidates.append(self.local_logs_by_user.get(username, ()))
             if action:
-                logs = [l for l in logs if l.action == action]
+                candidates.append(self.local_logs_by_action.get(action, ()))
             if entity:
-                logs = [l for l in logs if l.entity == entity]
-            return sorted(logs, key=lambda x: x.created_at, reverse=True)[:limit]
+                candidates.append(self.local_logs_by_entity.get(entity, ()))
+            result = []
+            for log in reversed(min(candidates, key=len)):
+                if username and log.user != username:
+                    continue
+                if action and log.action != action:
+                    continue
+                if entity and log.entity != entity:
+                    continue
+                result.append(log)
+                if len(result) >= limit:
+                    break
+            return result
         
         try:
             query = {}
@@ -314,12 +497,14 @@ class FavoritesRepository:
     
     def __init__(self, db_connection):
         self.db_connection = db_connection
-        self.local_favorites = []  # Для локального режима
-    
+        # Локальный режим: username -> {object_id: Favorite}, как
+        # уникальный составной индекс (username, object_id) в Mongo
+        self.local_favorites = defaultdict(dict)
+
     def get_favorites(self, username: str) -> List[Favorite]:
         """Получить избранные объекты пользователя"""
         if self.db_connection.local_mode:
-            return [f for f in self.local_favorites if f.username == username]
+            return list(self.local_favorites.get(username, {}).values())
         
         try:
             docs = list(self.db_connection.db['favorites'].find({"username": username}))
@@ -337,12 +522,11 @@ class FavoritesRepository:
     def add_favorite(self, favorite: Favorite) -> bool:
         """Добавить в избранное"""
         if self.db_connection.local_mode:
-            # Проверяем, нет ли уже такого объекта
-            if not any(f.username == favorite.username and f.object_id == favorite.object_id 
-                      for f in self.local_favorites):
-                self.local_favorites.append(favorite)
-                return True
-            return False
+            user_favorites = self.local_favorites[favorite.username]
+            if favorite.object_id in user_favorites:
+                return False
+            user_favorites[favorite.object_id] = favorite
+            return True
         
         try:
             favorite_dict = favorite.dict()
@@ -359,12 +543,7 @@ class FavoritesRepository:
     def remove_favorite(self, username: str, object_id: int) -> bool:
         """Удалить из избранного"""
         if self.db_connection.local_mode:
-            original_len = len(self.local_favorites)
-            self.local_favorites = [
-                f for f in self.local_favorites 
-                if not (f.username == username and f.object_id == object_id)
-            ]
-            return len(self.local_favorites) < original_len
+            return self.local_favorites.get(username, {}).pop(object_id, None) is not None
         
         try:
             result = self.db_connection.db['favorites'].delete_one({
@@ -342,8 +342,35 @@ def prepare_single_sample(sample_dict: Dict[str, Any], engineer: FeatureEngineer
     
     # Создать DataFrame из одной строки
     df = pd.DataFrame([sample])
-    
+
     # Трансформировать (transform тоже использует медианы, но на всякий случай)
     X = engineer.transform(df)
-    
+
     return X
+
+
+def prepare_samples(samples: list, engineer: FeatureEngineer) -> np.ndarray:
+    """
+    Подготовить батч примеров одной матрицей.
+
+    В отличие от поштучного prepare_single_sample, DataFrame строится
+    один раз на весь батч и transform вызывается один раз.
+
+    Args:
+        samples: Список словарей с признаками (могут содержать None)
+            или уже собранный DataFrame
+        engineer: Обученный FeatureEngineer (с медианами)
+
+    Returns:
+        Матрица признаков (len(samples) x n_features)
+    """
+    df = samples if isinstance(samples, pd.DataFrame) else pd.DataFrame(samples)
+
+    # Заполнить None/null медианами для опциональных параметров
+    optional_features = ['length_mm', 'width_mm', 'wall_thickness_mm', 'depth_mm', 'distance_to_weld_m']
+    for feature in optional_features:
+        if feature in df.columns:
+            fill_value = engineer.medians.get(feature, 0.0)
+            df[feature] = df[feature].fillna(fill_value)
+
+    return engineer.transform(df)
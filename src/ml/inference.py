@@ -2,6 +2,7 @@
 Inference сервис для предсказания критичности дефектов.
 """
 import numpy as np
+import pandas as pd
 import joblib
 import json
 import logging
@@ -13,7 +14,7 @@ from .config import (
     BEST_MODEL_PATH, METRICS_PATH,
     SEVERITY_REVERSE_MAP, MODELS_DIR
 )
-from .features import FeatureEngineer, prepare_single_sample
+from .features import FeatureEngineer, prepare_single_sample, prepare_samples
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -49,8 +50,10 @@ class DefectClassifier:
             except Exception as e:
                 raise RuntimeError(f"Не удалось автоматически обучить модель: {e}")
         
-        # Загрузить модель
-        self.model = joblib.load(BEST_MODEL_PATH)
+        # Загрузить модель. mmap_mode="r" отображает numpy-массивы модели
+        # в память страницами: несколько uvicorn-воркеров делят одни и те
+        # же физические страницы вместо копии ансамбля в каждом процессе
+        self.model = joblib.load(BEST_MODEL_PATH, mmap_mode="r")
         logger.info(f"[OK] Модель загружена: {BEST_MODEL_PATH}")
         
         # Загрузить feature engineer
@@ -135,17 +138,56 @@ class DefectClassifier:
         
         return result
     
-    def predict_batch(self, samples: list[Dict[str, Any]]) -> list[Dict[str, Any]]:
+    def predict_batch(self, samples) -> list[Dict[str, Any]]:
         """
-        Предсказать критичность для нескольких дефектов.
-        
+        Предсказать критичность для нескольких дефектов одним вызовом модели.
+
+        Признаки готовятся одной матрицей, predict/predict_proba вызываются
+        один раз на весь батч - фиксированные накладные расходы sklearn
+        не умножаются на количество дефектов.
+
         Args:
             samples: Список словарей с параметрами дефектов
-        
+                или готовый DataFrame (см. defects_to_ml_frame)
+
         Returns:
-            Список предсказаний
+            Список предсказаний (в том же порядке, что и samples)
         """
-        return [self.predict(sample) for sample in samples]
+        if not self.is_loaded:
+            raise RuntimeError("Модель не загружена. Вызовите load() сначала.")
+
+        if len(samples) == 0:
+            return []
+
+        try:
+            X = prepare_samples(samples, self.feature_engineer)
+        except Exception as e:
+            logger.error(f"Ошибка подготовки признаков: {e}")
+            raise ValueError(f"Неверный формат входных данных: {e}")
+
+        y_pred = self.model.predict(X)
+        y_pred_proba = self.model.predict_proba(X)
+
+        model_type = self.metadata.get('best_model', 'Unknown') if self.metadata else 'Unknown'
+        timestamp = datetime.now().isoformat()
+
+        results = []
+        for pred, proba in zip(y_pred, y_pred_proba):
+            severity = SEVERITY_REVERSE_MAP[pred]
+            probabilities = {
+                "normal": float(proba[0]),
+                "medium": float(proba[1]),
+                "high": float(proba[2])
+            }
+            results.append({
+                "severity": severity,
+                "probability": probabilities[severity],
+                "probabilities": probabilities,
+                "model_type": model_type,
+                "prediction_timestamp": timestamp
+            })
+
+        return results
     
     def get_model_info(self) -> Dict[str, Any]:
         """
@@ -251,6 +293,73 @@ def defect_to_ml_input(defect) -> Dict[str, Any]:
     return ml_input
 
 
+def defects_to_ml_frame(defects) -> pd.DataFrame:
+    """
+    Конвертирует список Defect в один DataFrame для ML предсказания.
+
+    Колоночный аналог defect_to_ml_input: вместо словаря на каждый дефект
+    (и дорогой сборки DataFrame из списка словарей) значения собираются
+    в списки по признакам за один проход, а DataFrame создается один раз.
+    На десятках тысяч дефектов это убирает секунды чистых накладных
+    расходов конструктора pandas.
+
+    Args:
+        defects: Список объектов Defect из models.py
+
+    Returns:
+        DataFrame с колонками-признаками, пригодный для predict_batch
+    """
+    depth_percent = []
+    depth_mm = []
+    erf_b31g = []
+    altitude_m = []
+    latitude = []
+    longitude = []
+    measurement_distance_m = []
+    length_mm = []
+    width_mm = []
+    wall_thickness_mm = []
+    distance_to_weld_m = []
+    defect_type = []
+    surface_location = []
+
+    for defect in defects:
+        params = defect.parameters
+        location = defect.location
+
+        depth_percent.append(params.depth_percent)
+        depth_mm.append(params.depth_mm)
+        erf_b31g.append(defect.erf_b31g_code)
+        altitude_m.append(location.altitude if location.altitude is not None else 0.0)
+        latitude.append(location.latitude)
+        longitude.append(location.longitude)
+        measurement_distance_m.append(defect.measurement_distance_m)
+        length_mm.append(params.length_mm)
+        width_mm.append(params.width_mm)
+        wall_thickness_mm.append(params.wall_thickness_nominal_mm)
+        distance_to_weld_m.append(defect.distance_to_weld_m)
+        # Literal-поля Defect - обычные строки; .value извлекается
+        # только если кто-то передал enum-член
+        defect_type.append(getattr(defect.defect_type, 'value', defect.defect_type))
+        surface_location.append(getattr(defect.surface_location, 'value', defect.surface_location))
+
+    return pd.DataFrame({
+        "depth_percent": depth_percent,
+        "depth_mm": depth_mm,
+        "erf_b31g": erf_b31g,
+        "altitude_m": altitude_m,
+        "latitude": latitude,
+        "longitude": longitude,
+        "measurement_distance_m": measurement_distance_m,
+        "length_mm": length_mm,
+        "width_mm": width_mm,
+        "wall_thickness_mm": wall_thickness_mm,
+        "distance_to_weld_m": distance_to_weld_m,
+        "defect_type": defect_type,
+        "surface_location": surface_location,
+    })
+
+
 if __name__ == "__main__":
     # Тестовый запуск
     classifier = DefectClassifier()
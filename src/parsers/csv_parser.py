@@ -4,6 +4,8 @@ CSV/XLSX Parser for IntegrityOS
 """
 
 import logging
+import os
+import pickle
 from typing import List, Optional, Tuple
 from pathlib import Path
 import pandas as pd
@@ -48,6 +50,10 @@ class CSVParser:
         'ВНТ': SurfaceLocation.EXTERNAL_TOP,
     }
 
+    # Числовые колонки очищенного CSV (позиции из _parse_row): сегмент,
+    # замер, расстояния, геометрия дефекта, ERF, координаты
+    NUMERIC_CSV_COLUMNS = (0, 1, 2, 6, 10, 11, 12, 13, 15, 17, 18, 19)
+
     def __init__(self, data_dir: str = 'data'):
         """Инициализация парсера
         
@@ -90,12 +96,25 @@ class CSVParser:
                 return defects, errors
             
             logger.info(f"Размер датасета: {df.shape}")
-            
+
+            # Числовые колонки конвертируются один раз векторно (включая
+            # запятую как десятичный разделитель); построчный _parse_float
+            # дальше получает готовые float и не парсит строки. Строка
+            # заголовка при coerce превращается в NaN и отсекается ниже
+            for col in self.NUMERIC_CSV_COLUMNS:
+                if col < df.shape[1] and not pd.api.types.is_numeric_dtype(df[col]):
+                    df[col] = pd.to_numeric(
+                        df[col].astype(str).str.replace(',', '.', regex=False),
+                        errors='coerce'
+                    )
+
             # Первая строка - заголовок (пропускаем)
-            # Начинаем со второй строки (индекс 1)
-            for idx in range(1, len(df)):
+            # itertuples отдает обычные кортежи: без создания pd.Series
+            # на каждую строку, как это делает df.iloc[idx]
+            rows = df.itertuples(index=False, name=None)
+            next(rows, None)
+            for idx, row in enumerate(rows, start=1):
                 try:
-                    row = df.iloc[idx]
                     defect = self._parse_row(row, idx, csv_path)
                     if defect:
                         defects.append(defect)
@@ -180,10 +199,12 @@ class CSVParser:
                 column_map = self._detect_column_mapping(df.iloc[header_row])
                 logger.info(f"Маппинг колонок: {column_map}")
                 
-                # Парсим строки данных
-                for idx in range(header_row + 1, len(df)):
+                # Парсим строки данных (кортежи вместо pd.Series на строку)
+                rows = df.itertuples(index=False, name=None)
+                for _ in range(header_row + 1):
+                    next(rows, None)
+                for idx, row in enumerate(rows, start=header_row + 1):
                     try:
-                        row = df.iloc[idx]
                         defect = self._parse_anomaly_row(row, idx, xlsx_path, column_map, sheet_name)
                         if defect:
                             defects.append(defect)
@@ -258,48 +279,48 @@ class CSVParser:
         
         return mapping
 
-    def _parse_anomaly_row(self, row: pd.Series, row_idx: int, source_file: str, 
+    def _parse_anomaly_row(self, row: tuple, row_idx: int, source_file: str,
                            column_map: dict, sheet_name: str) -> Optional[Defect]:
         """Парсит строку из листа аномалий Excel
-        
+
         Args:
-            row: Pandas Series с данными строки
+            row: Кортеж со значениями строки
             row_idx: Индекс строки в DataFrame
             source_file: Исходный файл
             column_map: Маппинг колонок
             sheet_name: Имя листа
-            
+
         Returns:
             Defect или None если строка невалидна
         """
         # Пропускаем пустые строки
-        if row.isna().all():
+        if all(pd.isna(v) for v in row):
             return None
-        
+
         try:
             # Расстояние измерения (обязательно)
             meas_dist_col = column_map.get('measurement_distance')
             if meas_dist_col is None:
                 return None
-            measurement_distance_m = self._parse_float(row.iloc[meas_dist_col])
+            measurement_distance_m = self._parse_float(row[meas_dist_col])
             if measurement_distance_m is None:
                 return None
-            
+
             # Номер секции
             section_col = column_map.get('section_number')
-            segment_number = self._parse_int(row.iloc[section_col]) if section_col is not None else 1
+            segment_number = self._parse_int(row[section_col]) if section_col is not None else 1
             if segment_number is None:
                 segment_number = 1
-            
+
             # Тип аномалии / идентификация
             anomaly_type_col = column_map.get('anomaly_type')
             identification_col = column_map.get('identification')
-            
+
             defect_type_str = ''
-            if identification_col is not None and pd.notna(row.iloc[identification_col]):
-                defect_type_str = str(row.iloc[identification_col]).strip().lower()
-            elif anomaly_type_col is not None and pd.notna(row.iloc[anomaly_type_col]):
-                defect_type_str = str(row.iloc[anomaly_type_col]).strip().lower()
+            if identification_col is not None and pd.notna(row[identification_col]):
+                defect_type_str = str(row[identification_col]).strip().lower()
+            elif anomaly_type_col is not None and pd.notna(row[anomaly_type_col]):
+                defect_type_str = str(row[anomaly_type_col]).strip().lower()
             
             if not defect_type_str:
                 return None
@@ -308,17 +329,17 @@ class CSVParser:
             
             # Толщина стенки
             wall_col = column_map.get('wall_thickness')
-            wall_thickness_mm = self._parse_float(row.iloc[wall_col]) if wall_col is not None else None
-            
+            wall_thickness_mm = self._parse_float(row[wall_col]) if wall_col is not None else None
+
             # Длина и ширина
             length_col = column_map.get('length_mm')
             width_col = column_map.get('width_mm')
-            length_mm = self._parse_float(row.iloc[length_col]) if length_col is not None else None
-            width_mm = self._parse_float(row.iloc[width_col]) if width_col is not None else None
-            
+            length_mm = self._parse_float(row[length_col]) if length_col is not None else None
+            width_mm = self._parse_float(row[width_col]) if width_col is not None else None
+
             # Глубина
             depth_col = column_map.get('depth_percent')
-            depth_percent = self._parse_float(row.iloc[depth_col]) if depth_col is not None else None
+            depth_percent = self._parse_float(row[depth_col]) if depth_col is not None else None
             
             # Для не-коррозионных дефектов глубина может быть 0
             if depth_percent is None:
@@ -332,9 +353,9 @@ class CSVParser:
             lon_col = column_map.get('longitude')
             alt_col = column_map.get('altitude')
             
-            latitude = self._parse_float(row.iloc[lat_col]) if lat_col is not None else None
-            longitude = self._parse_float(row.iloc[lon_col]) if lon_col is not None else None
-            altitude = self._parse_float(row.iloc[alt_col]) if alt_col is not None else None
+            latitude = self._parse_float(row[lat_col]) if lat_col is not None else None
+            longitude = self._parse_float(row[lon_col]) if lon_col is not None else None
+            altitude = self._parse_float(row[alt_col]) if alt_col is not None else None
             
             # Координаты обязательны
             if latitude is None or longitude is None:
@@ -344,12 +365,15 @@ class CSVParser:
             if not (40 < latitude < 56 and 46 < longitude < 88):
                 return None
             
+            # Значения уже распарсены и проверены выше - model_construct
+            # собирает модели без повторной pydantic-валидации каждой
+            # строки, это заметная доля времени массового импорта
             location = Location(
                 latitude=latitude,
                 longitude=longitude,
                 altitude=altitude
             )
-            
+
             # Параметры дефекта
             parameters = DefectParameters(
                 length_mm=length_mm,
@@ -358,36 +382,36 @@ class CSVParser:
                 depth_percent=depth_percent,
                 wall_thickness_nominal_mm=wall_thickness_mm
             )
-            
+
             # Локация на поверхности
             surface_col = column_map.get('surface_location')
-            surface_location_str = str(row.iloc[surface_col]).strip() if surface_col is not None and pd.notna(row.iloc[surface_col]) else 'ВНШ'
+            surface_location_str = str(row[surface_col]).strip() if surface_col is not None and pd.notna(row[surface_col]) else 'ВНШ'
             surface_location = self.LOCATION_MAPPING.get(surface_location_str, SurfaceLocation.EXTERNAL_BOTTOM)
-            
+
             # Расстояние до шва
             weld_col = column_map.get('distance_to_weld')
-            distance_to_weld_m = self._parse_float(row.iloc[weld_col]) if weld_col is not None else None
-            
+            distance_to_weld_m = self._parse_float(row[weld_col]) if weld_col is not None else None
+
             # ERF B31G
             erf_col = column_map.get('erf_b31g')
-            erf_b31g_code = self._parse_float(row.iloc[erf_col]) if erf_col is not None else None
-            
+            erf_b31g_code = self._parse_float(row[erf_col]) if erf_col is not None else None
+
             # Создаем дефект
-            defect = Defect(
+            defect = Defect.model_construct(
                 defect_id=str(uuid.uuid4()),
                 segment_number=segment_number,
                 measurement_number=row_idx,
                 measurement_distance_m=measurement_distance_m,
-                defect_type=defect_type,
+                defect_type=defect_type.value,
                 parameters=parameters,
                 location=location,
-                surface_location=surface_location,
+                surface_location=surface_location.value,
                 distance_to_weld_m=distance_to_weld_m,
                 erf_b31g_code=erf_b31g_code,
                 pipeline_id=f"MT-{segment_number:02d}",
                 source_file=f"{Path(source_file).name} [{sheet_name}]"
             )
-            
+
             return defect
             
         except Exception as e:
@@ -415,7 +439,7 @@ class CSVParser:
             logger.error(error_msg)
             return [], [error_msg]
 
-    def _parse_row(self, row: pd.Series, row_idx: int, source_file: str) -> Optional[Defect]:
+    def _parse_row(self, row: tuple, row_idx: int, source_file: str) -> Optional[Defect]:
         """Парсит одну строку CSV по реальным позициям (очищенный CSV)
         
         Структура CSV (позиции с 0):
@@ -439,46 +463,46 @@ class CSVParser:
         20+: пусто
         
         Args:
-            row: Pandas Series с данными строки
+            row: Кортеж со значениями строки
             row_idx: Индекс строки в DataFrame
             source_file: Исходный файл
-            
+
         Returns:
             Defect или None если строка невалидна
         """
         # Пропускаем пустые строки
-        if row.isna().all():
+        if all(pd.isna(v) for v in row):
             return None
-        
+
         try:
             # Базовые параметры (позиции 0-1)
-            segment_number = self._parse_int(row.iloc[0])
-            measurement_number = self._parse_int(row.iloc[1])
-            
+            segment_number = self._parse_int(row[0])
+            measurement_number = self._parse_int(row[1])
+
             if not segment_number or not measurement_number:
                 return None
-            
+
             # Расстояние (позиция 2)
-            measurement_distance_m = self._parse_float(row.iloc[2])
+            measurement_distance_m = self._parse_float(row[2])
             if not measurement_distance_m:
                 return None
-            
+
             # Тип дефекта (позиция 9)
-            defect_type_str = str(row.iloc[9]).strip().lower() if pd.notna(row.iloc[9]) else ''
+            defect_type_str = str(row[9]).strip().lower() if pd.notna(row[9]) else ''
             if not defect_type_str:
                 return None
             
             defect_type = self.DEFECT_TYPE_MAPPING.get(defect_type_str, DefectType.OTHER)
             
             # Толщина стенки (позиция 10)
-            wall_thickness_mm = self._parse_float(row.iloc[10])
-            
+            wall_thickness_mm = self._parse_float(row[10])
+
             # Длина и ширина (позиции 11-12)
-            length_mm = self._parse_float(row.iloc[11])
-            width_mm = self._parse_float(row.iloc[12])
-            
+            length_mm = self._parse_float(row[11])
+            width_mm = self._parse_float(row[12])
+
             # Глубина (позиция 13)
-            depth_percent = self._parse_float(row.iloc[13]) if len(row) > 13 else None
+            depth_percent = self._parse_float(row[13]) if len(row) > 13 else None
             
             # Для дефектов без измеренных параметров (металл. объекты и сварные швы) используем 0 как глубину
             if depth_percent is None:
@@ -491,16 +515,16 @@ class CSVParser:
                 return None
             
             # Локация на поверхн. (позиция 14)
-            surface_location_str = str(row.iloc[14]).strip() if len(row) > 14 and pd.notna(row.iloc[14]) else 'ВНШ'
+            surface_location_str = str(row[14]).strip() if len(row) > 14 and pd.notna(row[14]) else 'ВНШ'
             surface_location = self.LOCATION_MAPPING.get(
                 surface_location_str,
                 SurfaceLocation.EXTERNAL_BOTTOM
             )
             
             # GPS координаты (позиции 17-19)
-            latitude = self._parse_float(row.iloc[17]) if len(row) > 17 else None
-            longitude = self._parse_float(row.iloc[18]) if len(row) > 18 else None
-            altitude = self._parse_float(row.iloc[19]) if len(row) > 19 else None
+            latitude = self._parse_float(row[17]) if len(row) > 17 else None
+            longitude = self._parse_float(row[18]) if len(row) > 18 else None
+            altitude = self._parse_float(row[19]) if len(row) > 19 else None
             
             if not (latitude and longitude):
                 return None
@@ -509,12 +533,14 @@ class CSVParser:
             if not (40 < latitude < 50 and 50 < longitude < 70):
                 return None
             
+            # Значения уже распарсены и проверены выше - model_construct
+            # пропускает повторную pydantic-валидацию горячего цикла
             location = Location(
                 latitude=latitude,
                 longitude=longitude,
                 altitude=altitude
             )
-            
+
             # Параметры дефекта
             parameters = DefectParameters(
                 length_mm=length_mm,
@@ -528,21 +554,21 @@ class CSVParser:
             # severity = self._classify_severity(depth_percent, wall_thickness_mm)
             
             # Расстояние до шва (позиция 6)
-            distance_to_weld_m = self._parse_float(row.iloc[6]) if len(row) > 6 else None
-            
+            distance_to_weld_m = self._parse_float(row[6]) if len(row) > 6 else None
+
             # ERF B31G (позиция 15)
-            erf_b31g_code = self._parse_float(row.iloc[15]) if len(row) > 15 else None
+            erf_b31g_code = self._parse_float(row[15]) if len(row) > 15 else None
             
             # Создаем объект дефекта
-            defect = Defect(
+            defect = Defect.model_construct(
                 defect_id=str(uuid.uuid4()),  # Генерируем уникальный ID
                 segment_number=segment_number,
                 measurement_number=measurement_number,
                 measurement_distance_m=measurement_distance_m,
-                defect_type=defect_type,
+                defect_type=defect_type.value,
                 parameters=parameters,
                 location=location,
-                surface_location=surface_location,
+                surface_location=surface_location.value,
                 distance_to_weld_m=distance_to_weld_m,
                 erf_b31g_code=erf_b31g_code,
                 pipeline_id=f"MT-{segment_number:02d}",
@@ -599,24 +625,83 @@ class CSVParser:
         for directory, pattern in file_patterns:
             if directory.exists():
                 data_files.extend(directory.glob(pattern))
-        
+
         if not data_files:
             logger.warning(f"Файлы данных не найдены в {self.data_dir}")
             return all_defects, ["Файлы данных (CSV/XLSX) не найдены"]
-        
+
+        # Отпечаток исходных файлов: при совпадении парсинг можно
+        # пропустить и загрузить готовые объекты из pickle-кэша
+        fingerprint = sorted(
+            (str(f), f.stat().st_mtime_ns, f.stat().st_size) for f in data_files
+        )
+        cached = self._load_parse_cache(fingerprint)
+        if cached is not None:
+            all_defects, all_errors = cached
+            logger.info(f"Загружено {len(all_defects)} дефектов из кэша парсинга")
+            return all_defects, all_errors
+
         logger.info(f"Найдено {len(data_files)} файлов для парсинга")
-        
+
         for data_file in data_files:
             defects, errors = self.parse_file(str(data_file))
             all_defects.extend(defects)
             all_errors.extend(errors)
-        
+
         logger.info(f"Всего распарсено {len(all_defects)} дефектов")
         if all_errors:
             logger.info(f"Зафиксировано {len(all_errors)} ошибок/предупреждений")
-        
+
+        self._save_parse_cache(fingerprint, all_defects, all_errors)
+
         return all_defects, all_errors
 
+    def _cache_file(self) -> Path:
+        """Путь к файлу кэша распарсенных дефектов"""
+        return self.data_dir / 'cache' / 'parsed_defects.pkl'
+
+    def _load_parse_cache(self, fingerprint: list) -> Optional[Tuple[List[Defect], List[str]]]:
+        """Загружает дефекты из кэша, если исходные файлы не менялись
+
+        Args:
+            fingerprint: Отпечаток исходных файлов (путь, mtime, размер)
+
+        Returns:
+            Optional[Tuple[List[Defect], List[str]]]: Дефекты и ошибки или None
+        """
+        cache_file = self._cache_file()
+        if not cache_file.exists():
+            return None
+        try:
+            with open(cache_file, 'rb') as f:
+                payload = pickle.load(f)
+            if payload.get('fingerprint') != fingerprint:
+                return None
+            return payload['defects'], payload['errors']
+        except Exception as e:
+            logger.warning(f"Кэш парсинга не прочитан, файлы будут распарсены заново: {str(e)}")
+            return None
+
+    def _save_parse_cache(self, fingerprint: list, defects: List[Defect], errors: List[str]) -> None:
+        """Сохраняет результат парсинга в кэш
+
+        Args:
+            fingerprint: Отпечаток исходных файлов
+            defects: Распарсенные дефекты
+            errors: Ошибки парсинга
+        """
+        cache_file = self._cache_file()
+        try:
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            payload = {'fingerprint': fingerprint, 'defects': defects, 'errors': errors}
+            tmp_file = cache_file.with_suffix('.tmp')
+            with open(tmp_file, 'wb') as f:
+                pickle.dump(payload, f, protocol=5)
+            os.replace(tmp_file, cache_file)
+            logger.info(f"Кэш парсинга сохранён: {cache_file}")
+        except Exception as e:
+            logger.warning(f"Не удалось сохранить кэш парсинга: {str(e)}")
+
     def export_to_json(self, defects: List[Defect], output_file: str = 'defects.json') -> bool:
         """Экспортирует дефекты в JSON
         
@@ -628,13 +713,15 @@ class CSVParser:
             bool: Успешность операции
         """
         try:
-            import json
-            
-            defects_data = [json.loads(defect.model_dump_json()) for defect in defects]
-            
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(defects_data, f, ensure_ascii=False, indent=2)
-            
+            import orjson
+
+            defects_data = [defect.model_dump(mode='json') for defect in defects]
+
+            # Один вызов orjson.dumps и одна запись вместо инкрементального
+            # json.dump с поэлементным UTF-8 кодированием
+            with open(output_file, 'wb') as f:
+                f.write(orjson.dumps(defects_data, option=orjson.OPT_INDENT_2))
+
             logger.info(f"Экспортировано {len(defects)} дефектов в {output_file}")
             return True
             